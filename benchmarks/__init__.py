@@ -0,0 +1,51 @@
+"""
+Storefront benchmarks.
+
+Every script runs against a throwaway SQLite database (``benchmarks.settings``)
+so no MySQL or other service is needed::
+
+    python -m benchmarks.bench_serializers --products 50000
+    python -m benchmarks.bench_views --save micro     # view/serializer micro-benchmarks
+    python -m benchmarks.load --compare load          # HTTP load against the WSGI app
+
+``benchmarks.data`` builds the synthetic storefront (products, images, users
+with carts) and ``benchmarks.stats`` stores and compares baselines.
+"""
+import os
+
+
+def setup():
+    """Configure Django with the benchmark settings and build the schema."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command("migrate", verbosity=0, interactive=False)
+
+
+ADJECTIVES = ["red", "blue", "oak", "steel", "compact", "deluxe", "travel", "ceramic", "wireless", "vintage",
+              "organic", "smart", "classic", "portable", "premium", "linen", "leather", "glass", "bamboo", "cotton"]
+NOUNS = ["lamp", "desk", "mug", "chair", "speaker", "backpack", "kettle", "notebook", "jacket", "bottle",
+         "headphones", "blender", "sofa", "watch", "pillow", "charger", "bookshelf", "teapot", "camera", "rug"]
+
+
+def seed_products(count, batch_size=2000):
+    """Replace the catalog with ``count`` deterministic synthetic products."""
+    from website.models import Product
+
+    if Product.objects.count() == count:
+        return
+    Product.objects.all().delete()
+    Product.objects.bulk_create(
+        (
+            Product(
+                name=f"{ADJECTIVES[i % 20].title()} {NOUNS[(i // 20) % 20].title()} {i}",
+                price=f"{i % 900}.99",
+                description=f"{ADJECTIVES[(i * 7) % 20]} {NOUNS[(i * 3) % 20]} for everyday use, model {i % 97}",
+                stock=i % 11,
+            )
+            for i in range(count)
+        ),
+        batch_size=batch_size,
+    )
@@ -0,0 +1,56 @@
+"""
+Concurrent-connection throughput: the threaded WSGI server with the sync
+views versus uvicorn serving ``ecommerceb.asgi`` with the async views.
+
+Each server runs in its own single process against the same seeded SQLite
+database. The load driver is ``benchmarks.load``.
+
+    python -m benchmarks.bench_asgi --levels 1 8 32 64 --save asgi
+"""
+import argparse
+
+from benchmarks import data, setup
+from benchmarks.load import drive, start_server, stop_server
+from benchmarks.stats import compare_baseline, print_table, save_baseline, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    data.add_arguments(parser)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 64], help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=600, help="requests per level")
+    parser.add_argument("--path", action="append", help="paths to cycle through")
+    parser.add_argument("--save", metavar="NAME", help="store the results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="compare against baseline NAME")
+    args = parser.parse_args()
+
+    setup()
+    from website.models import Product
+
+    parameters = data.seed_from_args(args)
+    first = Product.objects.order_by("id").values_list("id", flat=True).first()
+    paths = args.path or ["/api/products/", f"/api/products/{first}", "/cart/"]
+    parameters.update(requests=args.requests, levels=args.levels, paths=paths)
+
+    results = {}
+    for kind in ("wsgi", "asgi"):
+        process, base_url = start_server(kind)
+        try:
+            for level in args.levels:
+                samples, errors, elapsed = drive(base_url, paths, args.requests, level, args.users)
+                every = [sample for path in paths for sample in samples[path]]
+                results[f"{kind} x{level}"] = summarize(every, elapsed)
+                if errors:
+                    print(f"{kind} x{level}: {sum(errors.values())} failed requests")
+        finally:
+            stop_server(process)
+
+    print_table(results, columns=("requests_per_sec", "p50_ms", "p95_ms", "p99_ms"))
+    if args.compare:
+        compare_baseline(args.compare, results, parameters)
+    if args.save:
+        save_baseline(args.save, results, parameters)
+
+
+if __name__ == "__main__":
+    main()
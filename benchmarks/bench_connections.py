@@ -0,0 +1,162 @@
+"""
+Per-request connection overhead: the WSGI handler with a new connection per
+request (``CONN_MAX_AGE = 0``), with persistent connections
+(``CONN_MAX_AGE = 60``) and with the in-process pool (``website.db.pool``).
+
+Every mode runs twice: once on long-lived worker threads, like a threaded
+WSGI server, and once with each request on a new thread, like sync code
+under ASGI. Each mode runs in its own process, configured only through the
+``DJANGO_DB_*`` environment variables the settings read.
+
+SQLite connects in well under a millisecond, so ``--connect-latency MS``
+adds a fixed delay to every real connect to stand in for a MySQL network
+handshake and authentication. To measure a real server instead, export
+``DJANGO_DB_ENGINE=mysql`` and the other ``DJANGO_DB_*`` variables.
+
+    python -m benchmarks.bench_connections --connect-latency 2 --save connections
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks import data, setup
+from benchmarks.stats import compare_baseline, print_table, save_baseline, summarize
+
+MODES = {
+    "connect per request": {"DJANGO_DB_CONN_MAX_AGE": "0", "DJANGO_DB_POOL_SIZE": "0"},
+    "persistent": {"DJANGO_DB_CONN_MAX_AGE": "60", "DJANGO_DB_POOL_SIZE": "0"},
+    "pool": {"DJANGO_DB_CONN_MAX_AGE": "0"},
+}
+
+
+def _count_connects(latency):
+    """Count (and optionally slow down) every real connect of the default database."""
+    from django.db import connections
+
+    vendor = next(
+        klass for klass in type(connections["default"]).__mro__
+        if klass.__module__.startswith("django.db.backends.") and "get_new_connection" in vars(klass)
+    )
+    original, opened, lock = vendor.get_new_connection, [0], threading.Lock()
+
+    def get_new_connection(self, conn_params):
+        with lock:
+            opened[0] += 1
+        if latency:
+            time.sleep(latency)
+        return original(self, conn_params)
+
+    vendor.get_new_connection = get_new_connection
+    return lambda: opened[0]
+
+
+def _measure(args):
+    setup()
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import connections
+
+    connections.close_all()
+    connects = _count_connects(args.connect_latency / 1000)
+    handler = WSGIHandler()
+    path, _, query = args.path.partition("?")
+
+    def request():
+        statuses = []
+        environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query, "HTTP_HOST": "localhost"}
+        setup_testing_defaults(environ)
+        started = time.perf_counter()
+        response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            b"".join(response)
+        finally:
+            # Sends request_finished, which closes or keeps the connection.
+            response.close()
+        return time.perf_counter() - started, statuses[0]
+
+    def on_new_thread():
+        result = []
+        thread = threading.Thread(target=lambda: result.append(request()))
+        thread.start()
+        thread.join()
+        return result[0]
+
+    run = on_new_thread if args.thread_per_request else request
+    lock, samples, failures = threading.Lock(), [], []
+    plan = iter(range(args.requests))
+
+    def worker():
+        while True:
+            with lock:
+                if next(plan, None) is None:
+                    return
+            elapsed, status = run()
+            with lock:
+                (samples if status.startswith("200") else failures).append(elapsed)
+
+    for _ in range(20):
+        run()
+    before = connects()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    summary = summarize(samples, elapsed)
+    summary["connects"] = connects() - before
+    summary["failures"] = len(failures)
+    print(json.dumps(summary))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    data.add_arguments(parser)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=4, help="worker threads")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--connect-latency", type=float, default=0, metavar="MS",
+                        help="extra milliseconds per real connect, standing in for a MySQL handshake")
+    parser.add_argument("--path", default="/", help="page to request (default: the storefront home page)")
+    parser.add_argument("--save", metavar="NAME", help="store the results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="compare against baseline NAME")
+    parser.add_argument("--thread-per-request", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        return _measure(args)
+
+    setup()
+    parameters = data.seed_from_args(args)
+    parameters.update(requests=args.requests, concurrency=args.concurrency, pool_size=args.pool_size,
+                      connect_latency_ms=args.connect_latency, path=args.path)
+
+    results = {}
+    for mode, variables in MODES.items():
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "benchmarks.settings",
+               "DJANGO_DB_POOL_SIZE": str(args.pool_size), **variables}
+        for threading_model, flag in (("threads", []), ("thread/request", ["--thread-per-request"])):
+            command = [sys.executable, "-m", "benchmarks.bench_connections", "--measure", *flag,
+                       "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                       "--connect-latency", str(args.connect_latency), "--path", args.path]
+            output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+            summary = json.loads(output.strip().splitlines()[-1])
+            if summary.pop("failures"):
+                print(f"{mode}, {threading_model}: some requests failed")
+            results[f"{mode}, {threading_model}"] = summary
+
+    print_table(results, columns=("requests_per_sec", "p50_ms", "p95_ms", "connects"))
+    if args.compare:
+        compare_baseline(args.compare, results, parameters)
+    if args.save:
+        save_baseline(args.save, results, parameters)
+
+
+if __name__ == "__main__":
+    main()
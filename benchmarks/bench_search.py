@@ -0,0 +1,53 @@
+"""
+Product search latency: in-process inverted index versus the database
+icontains fallback.
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks import setup, seed_products
+from benchmarks.stats import percentile
+
+QUERIES = ["lamp", "red lamp", "ceramic mug", "port", "wireless head", "vintage leather jacket", "model 42", "bl"]
+
+
+def report(label, samples):
+    print(
+        f"{label:<10} p50 {percentile(samples, 0.50) * 1000:8.2f} ms   "
+        f"p95 {percentile(samples, 0.95) * 1000:8.2f} ms   "
+        f"p99 {percentile(samples, 0.99) * 1000:8.2f} ms   "
+        f"mean {statistics.fmean(samples) * 1000:8.2f} ms"
+    )
+
+
+def run(func, rounds):
+    samples = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            started = time.perf_counter()
+            func(query, 20)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=25)
+    args = parser.parse_args()
+
+    setup()
+    from website.services.search import database_search, index
+
+    seed_products(args.products)
+    started = time.perf_counter()
+    index.warm(background=False)
+    print(f"Indexed {len(index):,} products in {time.perf_counter() - started:.2f} s")
+
+    report("index", run(index.search, args.rounds))
+    report("database", run(database_search, max(1, args.rounds // 5)))
+
+
+if __name__ == "__main__":
+    main()
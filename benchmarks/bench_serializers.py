@@ -0,0 +1,52 @@
+"""
+Products serialized per second: ModelSerializer + stock JSONRenderer versus
+values() rows + ProductListSerializer + ORJSONRenderer.
+"""
+import argparse
+import time
+
+from benchmarks import seed_products, setup
+
+
+def measure(label, func, count, repeat):
+    best = min(_timed(func) for _ in range(repeat))
+    print(f"{label:<42} {best * 1000:9.1f} ms  {count / best:12,.0f} products/s")
+    return best
+
+
+def _timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.renderers import JSONRenderer
+
+    from website.api.renderers import ORJSONRenderer
+    from website.api.serialization.product_serializer import ProductListSerializer, ProductSerializer
+    from website.models import Product
+
+    seed_products(args.products)
+    fields = ProductSerializer.Meta.fields
+
+    def before():
+        return JSONRenderer().render(ProductSerializer(Product.objects.all(), many=True).data)
+
+    def after():
+        return ORJSONRenderer().render(ProductListSerializer(Product.objects.values(*fields), fields).data)
+
+    print(f"Serializing {args.products:,} products (best of {args.repeat})")
+    slow = measure("ModelSerializer + JSONRenderer", before, args.products, args.repeat)
+    fast = measure("values() + ProductListSerializer + orjson", after, args.products, args.repeat)
+    print(f"speed-up: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Micro-benchmarks for the storefront's hot paths, in the style of
+pytest-benchmark: each case sets up its inputs once and hands the timed
+callable to ``benchmark``, which runs warm-up rounds and then records one
+sample per call.
+
+    python -m benchmarks.bench_views --rounds 200 --save micro
+    python -m benchmarks.bench_views --rounds 200 --compare micro
+"""
+import argparse
+import gc
+import time
+
+from benchmarks import data, setup
+from benchmarks.stats import compare_baseline, print_table, save_baseline, summarize
+
+CASES = {}
+
+
+def case(func):
+    CASES[func.__name__] = func
+    return func
+
+
+class Benchmark:
+    def __init__(self, rounds, warmup):
+        self.rounds, self.warmup = rounds, warmup
+        self.result = None
+
+    def __call__(self, func, *args, **kwargs):
+        for _ in range(self.warmup):
+            func(*args, **kwargs)
+        samples = []
+        gc.collect()
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            func(*args, **kwargs)
+            samples.append(time.perf_counter() - started)
+        self.result = summarize(samples)
+        self.result["ops_per_sec"] = 1000 / self.result["mean_ms"]
+        return self.result
+
+
+def _request(path, user=None):
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    request = RequestFactory(HTTP_HOST="localhost").get(path)
+    request.user = user or AnonymousUser()
+    return request
+
+
+def _bench_user():
+    from django.contrib.auth import get_user_model
+
+    return get_user_model().objects.get(username="bench-user-0")
+
+
+def _ok(response):
+    assert response.status_code == 200, response.status_code
+    return response
+
+
+@case
+def product_serializer(benchmark):
+    from django.conf import settings
+
+    from website.api.serialization.product_serializer import ProductSerializer
+    from website.models import Product
+
+    products = list(Product.objects.order_by("id")[:settings.PRODUCT_PAGE_SIZE])
+    benchmark(lambda: ProductSerializer(products, many=True).data)
+
+
+@case
+def api_product_list(benchmark):
+    from website.views import api_product_list
+
+    benchmark(lambda: _ok(api_product_list(_request("/api/products/?page_size=24"))))
+
+
+@case
+def cart_view(benchmark):
+    from django.core.cache import cache
+
+    from website.views import cart_view
+
+    user = _bench_user()
+
+    def view():
+        cache.clear()  # time a cold navbar summary as well as the cart page
+        return _ok(cart_view(_request("/cart/", user)))
+
+    benchmark(view)
+
+
+@case
+def dashboard(benchmark):
+    from website.views import dashboard
+
+    user = _bench_user()
+    benchmark(lambda: _ok(dashboard(_request("/dashboard/", user))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    data.add_arguments(parser)
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="run only these cases")
+    parser.add_argument("--save", metavar="NAME", help="store the results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="compare against baseline NAME")
+    args = parser.parse_args()
+
+    setup()
+    parameters = data.seed_from_args(args)
+    parameters.update(rounds=args.rounds)
+
+    results = {}
+    for name in args.case or CASES:
+        benchmark = Benchmark(args.rounds, args.warmup)
+        CASES[name](benchmark)
+        results[name] = benchmark.result
+    print_table(results, columns=("p50_ms", "p95_ms", "p99_ms", "ops_per_sec"))
+
+    if args.compare:
+        compare_baseline(args.compare, results, parameters)
+    if args.save:
+        save_baseline(args.save, results, parameters)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Deterministic synthetic storefront: products, product images (with real
+derivative files) and users with filled carts.
+
+Every step is idempotent on its row count, so repeated benchmark runs reuse
+the database instead of rebuilding it.
+"""
+from io import BytesIO
+
+from benchmarks import seed_products
+
+PASSWORD = "bench-pass-123"
+SOURCE_IMAGES = 8
+
+
+def _jpeg(index):
+    from PIL import Image
+
+    buffer = BytesIO()
+    shade = (index * 37) % 256
+    Image.new("RGB", (1200, 900), (shade, 255 - shade, (shade * 3) % 256)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def seed_images(count):
+    """Attach ``count`` images round-robin to the catalog, sharing a few real files."""
+    from django.core.files.base import ContentFile
+
+    from website.models import Product, ProductImage
+    from website.services.images import generate_derivatives
+
+    if ProductImage.objects.count() == count:
+        return
+    ProductImage.objects.all().delete()
+    if not count:
+        return
+    storage = ProductImage._meta.get_field("image").storage
+    sources = []
+    for index in range(min(count, SOURCE_IMAGES)):
+        name = f"product_images/bench-{index}.jpg"
+        if not storage.exists(name):
+            storage.save(name, ContentFile(_jpeg(index)))
+        sources.append(name)
+
+    product_ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+    images = ProductImage.objects.bulk_create(
+        ProductImage(product_id=product_ids[i % len(product_ids)], image=sources[i % len(sources)])
+        for i in range(count)
+    )
+    # Build derivatives once per source file and share them with every row using it.
+    variants = {}
+    for image in images[:len(sources)]:
+        variants[image.image.name] = generate_derivatives(image)
+    for image in images:
+        image.variants = variants[image.image.name]
+    ProductImage.objects.bulk_update(images, ["variants"], batch_size=2000)
+
+
+def seed_users(count, cart_lines=5):
+    """Create ``count`` users named ``bench-user-N``, each with a ``cart_lines`` cart."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+
+    from website.models import Cart, CartItem, Product
+
+    User = get_user_model()
+    users = User.objects.filter(username__startswith="bench-user-")
+    if users.count() == count and CartItem.objects.filter(cart__user__in=users).count() == count * cart_lines:
+        return
+    users.delete()
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create(
+        User(username=f"bench-user-{i}", email=f"bench-user-{i}@example.com", password=password)
+        for i in range(count)
+    )
+    carts = Cart.objects.bulk_create(Cart(user=user) for user in users)
+    product_ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+    CartItem.objects.bulk_create(
+        (
+            CartItem(
+                cart=cart,
+                product_id=product_ids[(index * 31 + line * 7) % len(product_ids)],
+                quantity=1 + (index + line) % 3,
+            )
+            for index, cart in enumerate(carts)
+            for line in range(min(cart_lines, len(product_ids)))
+        ),
+        batch_size=2000,
+    )
+
+
+def seed_storefront(products=5000, images=500, users=200, cart_lines=5):
+    seed_products(products)
+    seed_images(images)
+    seed_users(users, cart_lines)
+
+
+def add_arguments(parser):
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--images", type=int, default=500)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--cart-lines", type=int, default=5)
+
+
+def seed_from_args(args):
+    seed_storefront(args.products, args.images, args.users, args.cart_lines)
+    return {"products": args.products, "images": args.images, "users": args.users, "cart_lines": args.cart_lines}
@@ -0,0 +1,214 @@
+"""
+HTTP load driver for the storefront.
+
+By default it seeds the benchmark database, starts the WSGI app on a free
+local port in a child process (wsgiref, one thread per connection; uvicorn
+and the async views with ``--server asgi``) and drives it from
+``--concurrency`` client threads, each logged in as a different
+``bench-user-N``. Use ``--url`` to load an already running server
+instead (e.g. gunicorn against the same database).
+
+    python -m benchmarks.load --requests 2000 --concurrency 8 --save load
+    python -m benchmarks.load --path /api/products/ --path /cart/ --compare load
+"""
+import argparse
+import http.client
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks import data, setup
+from benchmarks.stats import compare_baseline, print_table, save_baseline, summarize
+
+DEFAULT_PATHS = ["/api/products/", "/api/products/search/?q=lamp", "/products/", "/cart/", "/dashboard/"]
+
+
+# ---- server ----
+def serve(port):
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+    from django.core.wsgi import get_wsgi_application
+
+    class Server(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+        request_queue_size = 128
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    httpd = make_server("127.0.0.1", port, get_wsgi_application(), server_class=Server, handler_class=QuietHandler)
+    print(httpd.server_port, flush=True)
+    httpd.serve_forever()
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _wait_for(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not listen on port {port} within {timeout} s")
+
+
+def start_server(kind="wsgi"):
+    """Start the app in a child process; ``kind`` is ``"wsgi"`` or ``"asgi"`` (uvicorn)."""
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": "benchmarks.settings",
+           "DJANGO_ASYNC_VIEWS": "1" if kind == "asgi" else "0"}
+    if kind == "asgi":
+        port = _free_port()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "ecommerceb.asgi:application", "--port", str(port),
+             "--log-level", "warning", "--no-access-log"],
+            env=env,
+        )
+        _wait_for(port, process)
+    else:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.load", "--serve"], stdout=subprocess.PIPE, text=True, env=env,
+        )
+        port = int(process.stdout.readline())
+    return process, f"http://127.0.0.1:{port}"
+
+
+def stop_server(process):
+    process.terminate()
+    process.wait()
+
+
+# ---- client ----
+class Session:
+    def __init__(self, base_url):
+        self.host = urlsplit(base_url).netloc
+        self.cookies = {}
+
+    def request(self, method, path, body=None):
+        headers = {"Host": self.host}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{key}={value}" for key, value in self.cookies.items())
+        if body is not None:
+            body = urlencode(body)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        connection = http.client.HTTPConnection(self.host, timeout=60)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        finally:
+            connection.close()
+        for header in response.headers.get_all("Set-Cookie") or ():
+            for key, morsel in SimpleCookie(header).items():
+                self.cookies[key] = morsel.value
+        return response.status
+
+    def login(self, username):
+        status = self.request("POST", "/login/", {"username": username, "password": data.PASSWORD})
+        if "sessionid" not in self.cookies:
+            raise RuntimeError(f"Logging in as {username} failed with HTTP {status}")
+
+
+def drive(base_url, paths, total, concurrency, users):
+    plan = itertools.islice(itertools.cycle(paths), total)
+    lock = threading.Lock()
+    samples, errors = defaultdict(list), defaultdict(int)
+
+    # Logging in hashes a password; keep it out of the measured window.
+    ready = threading.Barrier(concurrency + 1)
+
+    def worker(number):
+        session = Session(base_url)
+        try:
+            session.login(f"bench-user-{number % users}")
+        finally:
+            ready.wait()
+        while True:
+            with lock:
+                path = next(plan, None)
+            if path is None:
+                return
+            started = time.perf_counter()
+            try:
+                status = session.request("GET", path)
+            except OSError:
+                status = None
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status == 200:
+                    samples[path].append(elapsed)
+                else:
+                    errors[path] += 1
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return samples, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    data.add_arguments(parser)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--path", action="append", help=f"paths to cycle through (default: {DEFAULT_PATHS})")
+    parser.add_argument("--url", help="load this running server instead of starting one")
+    parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi",
+                        help="server to start: threaded wsgiref or uvicorn (needs uvicorn installed)")
+    parser.add_argument("--save", metavar="NAME", help="store the results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="compare against baseline NAME")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    setup()
+    if args.serve:
+        return serve(0)
+
+    parameters = data.seed_from_args(args)
+    paths = args.path or DEFAULT_PATHS
+    parameters.update(requests=args.requests, concurrency=args.concurrency, paths=paths)
+
+    process, base_url = (None, args.url) if args.url else start_server(args.server)
+    try:
+        samples, errors, elapsed = drive(base_url, paths, args.requests, args.concurrency, args.users)
+    finally:
+        if process:
+            stop_server(process)
+
+    results = {path: summarize(samples[path]) for path in paths if samples[path]}
+    every = [sample for path in paths for sample in samples[path]]
+    results["all"] = summarize(every, elapsed)
+    print(f"{len(every):,} requests in {elapsed:.2f} s with {args.concurrency} clients "
+          f"({results['all']['requests_per_sec']:.1f} req/s)")
+    print_table(results, columns=("p50_ms", "p95_ms", "p99_ms", "mean_ms"))
+    for path, count in errors.items():
+        print(f"  {path}: {count} failed requests")
+
+    if args.compare:
+        compare_baseline(args.compare, results, parameters)
+    if args.save:
+        save_baseline(args.save, results, parameters)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+# SQLite unless the environment says otherwise; the baselines were recorded
+# without connection reuse (see benchmarks.bench_connections).
+os.environ.setdefault('DJANGO_DB_ENGINE', 'sqlite3')
+os.environ.setdefault('DJANGO_DB_CONN_MAX_AGE', '0')
+
+from ecommerceb.settings import *  # noqa: E402,F401,F403
+
+DEBUG = False
+
+if DB_ENGINE == 'sqlite3':  # noqa: F405
+    DATABASES['default'].update(  # noqa: F405
+        NAME=os.environ.get('BENCH_DB', os.path.join(tempfile.gettempdir(), 'ecommerceb-bench.sqlite3')),
+        OPTIONS={'transaction_mode': 'IMMEDIATE', 'timeout': 30},
+    )
+
+LOGGING = {'version': 1, 'disable_existing_loggers': False}
+
+MEDIA_ROOT = os.environ.get('BENCH_MEDIA_ROOT', os.path.join(tempfile.gettempdir(), 'ecommerceb-bench-media'))
+
+# Timings must not include budget logging, and seeding builds derivatives itself.
+QUERY_BUDGET = None
+PRODUCT_IMAGE_DERIVATIVES_ON_UPLOAD = False
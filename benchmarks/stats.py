@@ -0,0 +1,96 @@
+"""
+Latency summaries and stored baselines shared by the benchmark scripts.
+
+Baselines are JSON files under ``benchmarks/baselines/``; save one with
+``--save NAME`` on a known-good commit and compare later runs against it with
+``--compare NAME``.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+# Metrics where a larger value is better; every other metric is a latency.
+HIGHER_IS_BETTER = {"ops_per_sec", "requests_per_sec"}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples, elapsed=None):
+    """Latency percentiles in milliseconds, plus throughput when ``elapsed`` is given."""
+    summary = {
+        "count": len(samples),
+        "min_ms": min(samples) * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+    }
+    if elapsed:
+        summary["requests_per_sec"] = len(samples) / elapsed
+    return summary
+
+
+def print_table(results, columns=("p50_ms", "p95_ms", "p99_ms")):
+    width = max(len(name) for name in results) + 2
+    print(f"{'':<{width}}" + "".join(f"{column:>16}" for column in columns))
+    for name, summary in results.items():
+        print(f"{name:<{width}}" + "".join(f"{summary.get(column, float('nan')):16.2f}" for column in columns))
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(name, results, parameters):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    payload = {
+        "commit": _commit(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "parameters": parameters,
+        "results": results,
+    }
+    with open(baseline_path(name), "w") as handle:
+        json.dump(payload, handle, indent=2, sort_keys=True)
+        handle.write("\n")
+    print(f"Saved baseline {baseline_path(name)}")
+
+
+def compare_baseline(name, results, parameters):
+    """Print the change of every shared metric against baseline ``name``."""
+    with open(baseline_path(name)) as handle:
+        baseline = json.load(handle)
+    print(f"Compared with baseline {name!r} (commit {baseline.get('commit')}, {baseline.get('recorded_at')})")
+    if baseline.get("parameters") != parameters:
+        print(f"  warning: baseline parameters {baseline.get('parameters')} differ from this run")
+    for case, summary in results.items():
+        before = baseline["results"].get(case)
+        if before is None:
+            print(f"  {case}: not in baseline")
+            continue
+        changes = []
+        for metric, value in summary.items():
+            if metric == "count" or not before.get(metric):
+                continue
+            delta = (value - before[metric]) / before[metric] * 100
+            better = delta > 0 if metric in HIGHER_IS_BETTER else delta < 0
+            changes.append(f"{metric} {delta:+.1f}%{'' if better or abs(delta) < 5 else ' !'}")
+        print(f"  {case}: " + ", ".join(changes))
@@ -3,6 +3,33 @@ ASGI config for ecommerceb project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Deploying under ASGI
+--------------------
+Run the app with any ASGI server, for example::
+
+    pip install uvicorn
+    uvicorn ecommerceb.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+or ``gunicorn ecommerceb.asgi:application -k uvicorn.workers.UvicornWorker``.
+
+Loading this module turns on ``ASYNC_VIEWS`` (``DJANGO_ASYNC_VIEWS=1``) unless
+the environment already sets it. ``/api/products/``, ``/api/products/<id>``
+and ``/cart/`` then route to their async views, which use the async ORM and
+cache APIs and hold no thread while they wait. Every other view is still
+synchronous; Django runs those in a thread pool. Set ``DJANGO_ASYNC_VIEWS=0``
+to serve the sync views under ASGI too.
+
+Notes:
+
+- Loading this module also defaults ``DJANGO_DB_CONN_MAX_AGE`` to 0. Async
+  requests do not reuse persistent connections the way WSGI worker threads
+  do; set ``DJANGO_DB_POOL_SIZE`` to reuse connections from a process-wide
+  pool instead (``website.db.pool``).
+- All project middleware is async-capable. A sync-only middleware added
+  to ``MIDDLEWARE`` would push every request back onto a thread.
+- ``python -m benchmarks.bench_asgi`` compares throughput at rising
+  connection counts against the threaded WSGI server.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +39,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerceb.settings')
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', '1')
+os.environ.setdefault('DJANGO_DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
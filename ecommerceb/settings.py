@@ -28,7 +28,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-wlc#w@*v(dz6&j2es93k5q2p(_!n-e=zpnnul@23=xonu#*-fm'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', 'true').lower() in ('1', 'true', 'yes')
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -55,6 +55,8 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'website.AuthUser'
 
 MIDDLEWARE = [
+    "website.middleware.RequestMetricsMiddleware",
+    "website.middleware.ReplicaPinningMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -69,33 +71,135 @@ ROOT_URLCONF = 'ecommerceb.urls'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # Prioritize JWT for stateless auth
-        'rest_framework.authentication.TokenAuthentication',  # Fallback if needed
+        'website.api.authentication.CachedJWTAuthentication',  # Prioritize JWT for stateless auth
+        'website.api.authentication.CachedTokenAuthentication',  # Fallback if needed
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         'rest_framework.permissions.IsAuthenticated',  # Requires valid token for protected views
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'website.api.renderers.ORJSONRenderer',  # falls back to the stock JSONRenderer without orjson
+        # The browsable API is a debugging aid; keep it out of production responses.
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
     ]
 }
 
+# Keyset pagination for product listings (website.pagination)
+PRODUCT_PAGE_SIZE = 24
+PRODUCT_MAX_PAGE_SIZE = 100
+
+# Listing filters and facets (website.services.catalog): upper bounds of the
+# price facet buckets, and how long a filtered page or facet count is cached.
+PRODUCT_PRICE_BUCKETS = (100, 500, 1000, 5000)
+PRODUCT_LIST_CACHE_TIMEOUT = 60
+# Most ids one batch read (/api/products/?ids=1,2,3 or a POST of {"ids": [...]}) may ask for.
+PRODUCT_BATCH_MAX_IDS = 200
+
+# Full-page cache for anonymous visits to the home and product pages
+# (website.page_cache); 0 turns it off.
+PAGE_CACHE_TIMEOUT = 60
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ecommerceb',
+    }
+}
+
+# Product read cache (website.services.product_cache); point the alias at a
+# shared backend such as Redis or Memcached when running several workers.
+PRODUCT_CACHE_ALIAS = 'default'
+PRODUCT_CACHE_TIMEOUT = 3600
+
+# In-process product search index (website.services.search); False always
+# answers /api/products/search/ with database icontains queries. Workers see
+# each other's writes through a version kept under PRODUCT_CACHE_ALIAS, so
+# that alias must be shared when running several workers.
+PRODUCT_SEARCH_INDEX = True
+
+# Listing image derivatives (website.services.images): widths in pixels,
+# encoder quality, and whether uploads build them as soon as they commit.
+PRODUCT_IMAGE_WIDTHS = (160, 320, 640)
+PRODUCT_IMAGE_QUALITY = 80
+PRODUCT_IMAGE_DERIVATIVES_ON_UPLOAD = True
+
+# Background task queue (website.services.tasks, worker: manage.py run_tasks).
+# TASKS_EAGER runs tasks in-process on commit instead of queueing them.
+TASKS_EAGER = False
+TASK_RETRY_BACKOFF = 10          # seconds before the first retry; doubles per attempt
+TASK_RETRY_BACKOFF_MAX = 3600
+TASK_RUNNING_TIMEOUT = 600       # running tasks older than this are requeued
+
+# Seconds a cached navbar cart summary lives; cart writes refresh it immediately.
+CART_SUMMARY_TIMEOUT = 900
+
+# Where logged-in users' carts live (website.services.cart_store): 'orm' for
+# Cart/CartItem rows, or 'cache' for one cache entry per cart, copied to the
+# database by manage.py persist_carts (one instance, every minute or so). Guest
+# carts always live in the cache, for CART_CACHE_TIMEOUT seconds.
+CART_STORE = 'orm'
+CART_CACHE_ALIAS = 'default'
+CART_CACHE_TIMEOUT = 14 * 24 * 3600
+
+# Seconds a pending order holds its stock before manage.py expire_reservations
+# returns it (website.services.checkout).
+ORDER_RESERVATION_TIMEOUT = 900
+
+# Admin dashboard (website.services.dashboard): statistics are cached for
+# DASHBOARD_STATS_TIMEOUT seconds and each list shows DASHBOARD_TOP_N rows.
+DASHBOARD_STATS_TIMEOUT = 60
+DASHBOARD_TOP_N = 8
+DASHBOARD_LOW_STOCK_THRESHOLD = 5
+
+# Route the product API reads and the cart page to their async views. On by
+# default under ecommerceb/asgi.py, off under WSGI.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '0') == '1'
+
+# Request metrics (website.middleware, scraped from /metrics). Views issuing
+# more than QUERY_BUDGET queries are logged, or fail with "raise"; override a
+# single view with @query_budget(n). /metrics answers staff users, scrapers
+# sending "Authorization: Bearer $DJANGO_METRICS_TOKEN" and METRICS_ALLOWED_IPS.
+# Leave loopback out of the allowlist behind a tunnel or local proxy
+# (cloudflared connects from 127.0.0.1).
+QUERY_BUDGET = 30
+QUERY_BUDGET_ACTION = 'raise' if DEBUG else 'log'
+METRICS_ALLOWED_IPS = []
+METRICS_TOKEN = os.environ.get('DJANGO_METRICS_TOKEN', '')
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Adds the auth_version claim that lets a password change or logout revoke tokens.
+    'TOKEN_OBTAIN_SERIALIZER': 'website.api.authentication.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'website.api.authentication.TokenRefreshSerializer',
 }
 
+# API authentication resolves users from cached snapshots
+# (website.services.auth_cache): shared for AUTH_USER_CACHE_TIMEOUT seconds,
+# trusted in-process for AUTH_USER_LOCAL_TTL seconds, which bounds how long
+# another worker may accept a revoked token.
+AUTH_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = 300
+AUTH_USER_LOCAL_TTL = 5
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept per process; under DEBUG the
+            # autoreloader clears them whenever a template file changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'website.context_processors.cart_summary',
             ],
         },
     },
@@ -106,17 +210,44 @@ WSGI_APPLICATION = 'ecommerceb.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection settings come from the environment (DJANGO_DB_*). Under WSGI each
+# worker thread keeps its connection for DJANGO_DB_CONN_MAX_AGE seconds and
+# pings it before reuse while DJANGO_DB_HEALTH_CHECKS is on. ecommerceb/asgi.py
+# defaults the age to 0; setting DJANGO_DB_POOL_SIZE instead shares that many
+# connections per process across threads and requests (website.db.pool).
+DB_POOL_SIZE = int(os.environ.get('DJANGO_DB_POOL_SIZE', '0'))
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'mysql')
+
 DATABASES = {
     'default': {
-        'ENGINE' : 'django.db.backends.mysql',
-        'NAME' : 'e_commerce',
-        'USER' : 'root',
-        'PASSWORD' : 'root',
-        'HOST' : 'localhost',
-        'PORT' : '3306',
+        'ENGINE' : f"{'website.db.backends' if DB_POOL_SIZE else 'django.db.backends'}.{DB_ENGINE}",
+        'NAME' : os.environ.get('DJANGO_DB_NAME', 'e_commerce'),
+        'USER' : os.environ.get('DJANGO_DB_USER', 'root'),
+        'PASSWORD' : os.environ.get('DJANGO_DB_PASSWORD', 'root'),
+        'HOST' : os.environ.get('DJANGO_DB_HOST', 'localhost'),
+        'PORT' : os.environ.get('DJANGO_DB_PORT', '3306'),
+        'CONN_MAX_AGE' : 0 if DB_POOL_SIZE else int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS' : os.environ.get('DJANGO_DB_HEALTH_CHECKS', '1') == '1',
+        'POOL' : {
+            'max_size': DB_POOL_SIZE,
+            'timeout': float(os.environ.get('DJANGO_DB_POOL_TIMEOUT', '10')),
+            'max_lifetime': int(os.environ.get('DJANGO_DB_POOL_MAX_LIFETIME', '1800')),
+        },
     }
 }
 
+# Read replicas for catalog reads (website.db.routers): one alias per host in
+# DJANGO_DB_REPLICA_HOSTS, chosen "round_robin" or by "least_latency". A client
+# that writes reads the primary for REPLICA_PIN_SECONDS afterwards.
+for number, host in enumerate(filter(None, os.environ.get('DJANGO_DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['website.db.routers.ReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+REPLICA_SELECTION = os.environ.get('DJANGO_DB_REPLICA_SELECTION', 'round_robin')
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'db_pin'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -192,13 +323,18 @@ LOGGING = {
     },
     "root": {
         "handlers": ["console"],
-        "level": "DEBUG",
+        "level": "WARNING",
     },
     "loggers": {
         "django": {
             "handlers": ["console"],
             "level": "INFO",
             "propagate": False,
-        }
+        },
+        "website": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
\ No newline at end of file
@@ -1,12 +1,15 @@
 from django.contrib import admin
 from website.models import Product
 from website.models import ProductImage
-from website.models import AuthUser, Cart, CartItem
+from website.models import AuthUser, Cart, CartItem, Order, OrderItem, Task
 # Register your models here.
 admin.site.register(Product)
 admin.site.register(ProductImage)
 admin.site.register(AuthUser)
 admin.site.register(Cart)
 admin.site.register(CartItem)
+admin.site.register(Task)
+admin.site.register(Order)
+admin.site.register(OrderItem)
 
 
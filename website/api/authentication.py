@@ -0,0 +1,81 @@
+"""
+JWT and Token authentication backed by ``website.services.auth_cache``.
+
+Both classes validate the credential and then resolve the user from the
+cached snapshot instead of querying ``AuthUser`` on every request. Access
+and refresh tokens issued by ``/api/token/`` carry the user's
+``auth_version``; a token whose version is older than the user's was
+revoked by a password change, a deactivation or a logout.
+
+Tokens issued before the claim existed have no version and are accepted
+until they expire (``ACCESS_TOKEN_LIFETIME``).
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import serializers
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from website.models import AuthUser
+from website.services import auth_cache
+
+AUTH_VERSION_CLAIM = 'auth_version'
+
+
+def check_token_user(token):
+    """The active, unrevoked user that validated JWT ``token`` was issued to."""
+    try:
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(_("Token contained no recognizable user identification"))
+    try:
+        user = auth_cache.get_user(user_id)
+    except (AuthUser.DoesNotExist, TypeError, ValueError):
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if not user.is_active:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    version = token.get(AUTH_VERSION_CLAIM)
+    if version is not None and version != user.auth_version:
+        raise AuthenticationFailed(_("Token has been revoked."), code="token_revoked")
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        return check_token_user(validated_token)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        user_id = auth_cache.token_user_id(key)
+        if user_id is None:
+            raise AuthenticationFailed(_('Invalid token.'))
+        try:
+            user = auth_cache.get_user(user_id)
+        except AuthUser.DoesNotExist:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        if not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        # Unsaved: views only read request.auth, and loading it would cost the query we avoid.
+        return (user, Token(key=key, user_id=user_id))
+
+
+# -------------------------
+# Token endpoints (SIMPLE_JWT serializers)
+# -------------------------
+class TokenObtainPairSerializer(serializers.TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # Copied into every access token minted from this refresh token.
+        token[AUTH_VERSION_CLAIM] = user.auth_version
+        return token
+
+
+class TokenRefreshSerializer(serializers.TokenRefreshSerializer):
+    def validate(self, attrs):
+        check_token_user(self.token_class(attrs['refresh']))
+        return super().validate(attrs)
@@ -2,6 +2,46 @@ from rest_framework import serializers
 from website.models import Product   # import from the right location
 
 class ProductSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, **kwargs):
+        # Optional sparse fieldset, e.g. ProductSerializer(qs, many=True, fields=['id', 'name'])
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Product
-        fields = [ 'name', 'price', 'description']
+        fields = [ 'id', 'name', 'price', 'description']
+        read_only_fields = ['id']
+
+
+class ProductBulkSerializer(ProductSerializer):
+    # Rows carrying an existing id update that product; the rest are created.
+    id = serializers.IntegerField(required=False, min_value=1)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['stock']
+        read_only_fields = []
+
+
+class ProductListSerializer:
+    """
+    Read-only fast path for list responses: shapes ``values()`` rows like
+    ``ProductSerializer`` output without building a serializer field tree.
+    """
+    def __init__(self, rows, fields=None):
+        self.rows = rows
+        self.fields = list(fields or ProductSerializer.Meta.fields)
+
+    @property
+    def data(self):
+        fields = self.fields
+        has_price = 'price' in fields
+        results = []
+        for row in self.rows:
+            item = {name: row[name] for name in fields}
+            if has_price and item['price'] is not None:
+                item['price'] = str(item['price'])
+            results.append(item)
+        return results
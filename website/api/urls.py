@@ -1,6 +1,7 @@
 # website/api/urls.py
+from django.conf import settings
 from django.urls import path
-from website.api.views import ProductListCreateView, ProductRetrieveUpdateDeleteView
+from website.api.views import ProductListCreateView, ProductRetrieveUpdateDeleteView, product_detail_async
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
@@ -10,6 +11,6 @@ urlpatterns = [
 
     # ---------------- Products ----------------
     path('products/', ProductListCreateView.as_view(), name='product_list_create'),          # GET: list, POST: add
-    path('products/<int:pk>/', ProductRetrieveUpdateDeleteView.as_view(), name='product_detail'),  # GET/PUT/DELETE single product
+    path('products/<int:pk>/', product_detail_async if settings.ASYNC_VIEWS else ProductRetrieveUpdateDeleteView.as_view(), name='product_detail'),  # GET/PUT/DELETE single product
     path('ping',ProductRetrieveUpdateDeleteView.as_view(),name="ping"),
 ]
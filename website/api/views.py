@@ -1,30 +1,58 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from website.models import Product
-from website.api.serialization.product_serializer import ProductSerializer
+from website.api.serialization.product_serializer import ProductListSerializer, ProductSerializer
+from website.services import catalog, product_cache, product_import
+from website.conditional import async_product_conditional, product_conditional
+from website.pagination import (
+    InvalidCursor, InvalidFields, get_fields, get_page_size, page_links,
+)
 import logging
 
+logger = logging.getLogger(__name__)
+
 
 class ProductListCreateView(APIView):
     # Temporarily removed authentication requirement for testing
     # permission_classes = [IsAuthenticated]
 
+    @method_decorator(product_conditional)
     def get(self, request):
-        logger = logging.getLogger(__name__) 
-        logger.error("This is an informational message.")
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        try:
+            fields = get_fields(request, ProductSerializer.Meta.fields)
+            if 'ids' in request.GET:
+                ids = catalog.parse_ids(request.GET['ids'])
+
+                def serialize(product):
+                    data = ProductSerializer(product).data
+                    return {field: data[field] for field in fields}
+
+                return Response(catalog.batch_payload(ids, product_cache.get_many(ids), serialize))
+            query = catalog.parse(request.GET)
+            products = Product.objects.values(*dict.fromkeys(fields + ['id', query.sort_field]))
+            page = catalog.get_page(
+                products, query, request.GET.get('cursor'), get_page_size(request), variant=','.join(fields),
+            )
+            facets = catalog.get_facets(query) if catalog.wants_facets(request.GET) else None
+        except (InvalidCursor, InvalidFields, catalog.InvalidQuery) as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = ProductListSerializer(page.items, fields=fields)
+        payload = {**page_links(request, page), "results": serializer.data}
+        if facets is not None:
+            payload["facets"] = facets
+        return Response(payload)
 
     # ---------- FIXED ----------
     
     def post(self, request):
-        logger = logging.getLogger(__name__) 
-        logger.info("This is an informational message.")
         serializer = ProductSerializer(data=request.data)
         try:
             if serializer.is_valid():
@@ -69,8 +97,12 @@ class ProductRetrieveUpdateDeleteView(APIView):
         except Product.DoesNotExist:
             return None
 
+    @method_decorator(product_conditional)
     def get(self, request, pk):
-        product = self.get_object(pk)
+        try:
+            product = product_cache.get_product(pk)
+        except Product.DoesNotExist:
+            product = None
         if not product:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         serializer = ProductSerializer(product)
@@ -93,8 +125,59 @@ class ProductRetrieveUpdateDeleteView(APIView):
         product.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+
+_product_detail = ProductRetrieveUpdateDeleteView.as_view()
+
+
+@async_product_conditional
+async def _product_detail_read(request, pk):
+    try:
+        product = await product_cache.aget_product(pk)
+    except Product.DoesNotExist:
+        return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    return JsonResponse(ProductSerializer(product).data)
+
+
+def _api_user(request):
+    """The user the DRF view's authenticators (JWT, Token) find, or ``None``."""
+    drf_request = Request(request, authenticators=ProductRetrieveUpdateDeleteView().get_authenticators())
+    return drf_request.user if drf_request.user.is_authenticated else None
+
+
+@csrf_exempt
+async def product_detail_async(request, pk):
+    """
+    Async reads for ProductRetrieveUpdateDeleteView. DRF views are sync-only,
+    so GET is served natively and writes go to the DRF view. Both accept
+    exactly the DRF view's credentials.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return await sync_to_async(_product_detail)(request, pk=pk)
+    try:
+        user = await sync_to_async(_api_user)(request)
+    except AuthenticationFailed as exc:
+        detail = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+        return JsonResponse(detail, status=exc.status_code)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."},
+                            status=status.HTTP_401_UNAUTHORIZED)
+    return await _product_detail_read(request, pk=pk)
+
+class ProductBulkView(APIView):
+    """POST a JSON list of products; rows with a known id update, the rest create."""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        if not isinstance(request.data, list):
+            return Response({"detail": "Expected a list of products."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            batch_size = max(1, int(request.query_params.get("batch_size", product_import.DEFAULT_BATCH_SIZE)))
+        except ValueError:
+            return Response({"detail": "batch_size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        report = product_import.import_products(request.data, batch_size=batch_size)
+        return Response(report, status=status.HTTP_200_OK)
+
 # Optional: CSRF token view (not needed anymore, but kept if useful)
-from django.http import JsonResponse
 from django.middleware.csrf import get_token
 from django.views.decorators.csrf import ensure_csrf_cookie
 
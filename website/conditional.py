@@ -0,0 +1,97 @@
+"""
+ETag / Last-Modified support for the product API.
+
+Validators come from a cheap aggregate (``MAX(updated_at)`` plus ``COUNT``)
+for listings, or from the cached product for detail reads, so an unchanged
+resource is answered with 304 before anything is serialized. The query
+string and ``Accept`` header are folded into the ETag because each
+combination is a distinct representation.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+from website.models import Product
+from website.services import product_cache
+
+
+def catalog_state(request):
+    # Computed once per request and shared by the ETag and Last-Modified hooks.
+    state = getattr(request, '_catalog_state', None)
+    if state is None:
+        state = Product.objects.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+        request._catalog_state = state
+    return state
+
+
+def _product_updated_at(request, pk):
+    cached = getattr(request, '_product_updated_at', None)
+    if cached is not None and cached[0] == pk:
+        return cached[1]
+    try:
+        updated_at = product_cache.get_product(pk).updated_at
+    except Product.DoesNotExist:
+        updated_at = None
+    request._product_updated_at = (pk, updated_at)
+    return updated_at
+
+
+def _is_batch(request):
+    # Batch reads (?ids= or POST) are not cacheable as one catalog-wide representation.
+    return request.method == 'POST' or 'ids' in request.GET
+
+
+def product_etag(request, pk=None, id=None):
+    pk = pk if pk is not None else id
+    if pk is None and _is_batch(request):
+        return None
+    if pk is None:
+        state = catalog_state(request)
+        stamp = f"{state['last_modified']}:{state['count']}"
+    else:
+        updated_at = _product_updated_at(request, pk)
+        if updated_at is None:
+            return None
+        stamp = updated_at.isoformat()
+    raw = f"{stamp}|{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def product_last_modified(request, pk=None, id=None):
+    pk = pk if pk is not None else id
+    if pk is None and _is_batch(request):
+        return None
+    if pk is None:
+        return catalog_state(request)['last_modified']
+    return _product_updated_at(request, pk)
+
+
+product_conditional = condition(etag_func=product_etag, last_modified_func=product_last_modified)
+
+
+def async_product_conditional(view):
+    """
+    ``product_conditional`` for async views. Django calls the validator hooks
+    synchronously, so the state they read is loaded here first with the
+    async ORM and the hooks only see the memoized values.
+    """
+    conditional = product_conditional(view)
+
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        pk = kwargs.get('pk', kwargs.get('id'))
+        if pk is not None:
+            try:
+                updated_at = (await product_cache.aget_product(pk)).updated_at
+            except Product.DoesNotExist:
+                updated_at = None
+            request._product_updated_at = (pk, updated_at)
+        elif not _is_batch(request):
+            request._catalog_state = await Product.objects.aaggregate(
+                last_modified=Max('updated_at'), count=Count('id'),
+            )
+        return await conditional(request, *args, **kwargs)
+
+    return inner
@@ -0,0 +1,15 @@
+from website.services.cart import cart_owner, get_summary
+
+
+def cart_summary(request):
+    """Expose the cached cart summary to every template as ``cart_summary``."""
+    if getattr(request, 'user', None) is None:
+        return {}
+    # Async views load the summary up front; fetching it here would block the event loop.
+    summary = getattr(request, '_cart_summary', None)
+    if summary is not None:
+        return {'cart_summary': summary}
+    owner = cart_owner(request)
+    if owner is None:
+        return {}
+    return {'cart_summary': get_summary(owner)}
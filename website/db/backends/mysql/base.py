@@ -0,0 +1,11 @@
+"""MySQL backend that checks connections out of ``website.db.pool``."""
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+
+from website.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, MySQLDatabaseWrapper):
+    @staticmethod
+    def check_raw(raw):
+        raw.ping()
+        return True
@@ -0,0 +1,11 @@
+"""SQLite backend that checks connections out of ``website.db.pool`` (benchmarks and tests)."""
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+
+from website.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, SQLiteDatabaseWrapper):
+    @staticmethod
+    def check_raw(raw):
+        raw.execute("SELECT 1").close()
+        return True
@@ -0,0 +1,209 @@
+"""
+In-process database connection pool.
+
+Django keeps at most one connection per thread and alias. With
+``CONN_MAX_AGE = 0`` every request pays for a fresh connect (TCP, TLS and
+authentication for MySQL); with ``CONN_MAX_AGE > 0`` a worker thread keeps
+its connection, which helps WSGI workers but not ASGI, where sync code runs
+on short-lived executor threads and async views leave no thread to keep it.
+
+The pooled backends (``website.db.backends.mysql`` and ``.sqlite3``) close
+their connection at the end of every request as usual, but ``close()``
+hands the raw connection back to a process-wide pool and the next
+``connect()`` on any thread checks one out again. Configure them with a
+``POOL`` entry in the database settings::
+
+    'ENGINE': 'website.db.backends.mysql',
+    'CONN_MAX_AGE': 0,
+    'POOL': {'max_size': 10, 'timeout': 10, 'max_lifetime': 1800},
+
+``max_size`` caps the open connections per process; ``connect()`` waits up
+to ``timeout`` seconds for one to come back before raising ``PoolTimeout``.
+Connections older than ``max_lifetime`` seconds are closed instead of being
+reused. With ``CONN_HEALTH_CHECKS`` each reused connection is pinged on
+checkout.
+"""
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.utils import OperationalError
+
+DEFAULTS = {'max_size': 10, 'timeout': 10, 'max_lifetime': 1800}
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, close, check=None, max_size=10, timeout=10, max_lifetime=1800):
+        self._close = close
+        self._check = check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._born = {}
+        self.size = 0
+        self.opened = 0
+        self.timeouts = 0
+
+    def acquire(self, connect):
+        """Return an idle connection, or ``connect()`` a new one while below ``max_size``."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._condition:
+                while not self._idle and self.size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._condition.wait(remaining):
+                        if not self._idle and self.size >= self.max_size:
+                            self.timeouts += 1
+                            raise PoolTimeout(f"No database connection free within {self.timeout} s "
+                                              f"({self.max_size} in use).")
+                if self._idle:
+                    raw = self._idle.pop()
+                else:
+                    raw = None
+                    self.size += 1
+            if raw is None:
+                return self._open(connect)
+            if self._usable(raw):
+                return raw
+            self._discard(raw)
+
+    def release(self, raw, discard=False):
+        if discard:
+            self._discard(raw)
+            return
+        with self._condition:
+            # Most recently used first, so spare connections age out.
+            self._idle.append(raw)
+            self._condition.notify()
+
+    def clear(self):
+        """Close every idle connection; checked-out ones are closed when released."""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for raw in idle:
+            self._discard(raw)
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def _open(self, connect):
+        try:
+            raw = connect()
+        except BaseException:
+            with self._condition:
+                self.size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._born[id(raw)] = time.monotonic()
+            self.opened += 1
+        return raw
+
+    def _usable(self, raw):
+        born = self._born.get(id(raw), 0)
+        if self.max_lifetime is not None and time.monotonic() - born > self.max_lifetime:
+            return False
+        if self._check is None:
+            return True
+        try:
+            return self._check(raw)
+        except Exception:
+            return False
+
+    def _discard(self, raw):
+        with self._condition:
+            self._born.pop(id(raw), None)
+            self.size -= 1
+            self._condition.notify()
+        try:
+            self._close(raw)
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(wrapper):
+    """The pool for ``wrapper``'s database, created on first use in this process."""
+    global _pools_pid
+    with _pools_lock:
+        # Forked workers (e.g. gunicorn --preload) must not share the parent's sockets.
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        # Keyed by target too: the test runner repoints NAME at the test database.
+        key = (wrapper.alias, *(str(wrapper.settings_dict.get(name)) for name in ('HOST', 'PORT', 'USER', 'NAME')))
+        pool = _pools.get(key)
+        if pool is None:
+            options = {**DEFAULTS, **wrapper.settings_dict.get('POOL', {})}
+            pool = _pools[key] = ConnectionPool(
+                close=lambda raw: raw.close(),
+                check=wrapper.check_raw if wrapper.settings_dict.get('CONN_HEALTH_CHECKS') else None,
+                **options,
+            )
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.clear()
+        _pools.clear()
+
+
+def stats():
+    """Totals over every pool in this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {
+        'connections': sum(pool.size for pool in pools),
+        'idle': sum(pool.idle for pool in pools),
+        'opened': sum(pool.opened for pool in pools),
+        'timeouts': sum(pool.timeouts for pool in pools),
+    }
+
+
+class PooledDatabaseWrapperMixin:
+    """Check raw connections out of the process pool instead of opening them."""
+
+    def __init__(self, settings_dict, *args, **kwargs):
+        super().__init__(settings_dict, *args, **kwargs)
+        if settings_dict.get('CONN_MAX_AGE'):
+            raise ImproperlyConfigured(
+                f"Database {self.alias!r} uses a connection pool; set CONN_MAX_AGE to 0 so "
+                "connections go back to the pool at the end of each request."
+            )
+
+    @property
+    def pool(self):
+        return get_pool(self)
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(functools.partial(super().get_new_connection, conn_params))
+
+    @staticmethod
+    def check_raw(raw):
+        """Health check for a reused raw connection; backends override it."""
+        return True
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # A connection left mid-transaction, or broken by an error, is not safe to share.
+        discard = self.in_atomic_block or not self.get_autocommit() or (
+            self.errors_occurred and not self.is_usable()
+        )
+        self.pool.release(self.connection, discard=discard)
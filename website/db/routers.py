@@ -0,0 +1,163 @@
+"""
+Read replicas for catalog reads.
+
+``ReplicaRouter`` sends reads of the catalog models (``Product`` and
+``ProductImage``) made while serving a request to one of
+``REPLICA_DATABASES``. Every write, every other model, and every read
+outside a request (management commands, the task worker, the search index
+build) uses ``default``.
+
+Replicas lag, so a request reads the primary instead when:
+
+- its method is unsafe (POST, PUT, PATCH, DELETE): it may write what it read;
+- it has already written, or it is inside a transaction on the primary;
+- the same client wrote less than ``REPLICA_PIN_SECONDS`` ago. The request
+  that wrote sets a short-lived ``REPLICA_PIN_COOKIE`` (read-your-writes).
+
+``REPLICA_SELECTION`` picks the replica. ``"round_robin"`` rotates through
+them. ``"least_latency"`` prefers the replica whose queries have been
+fastest lately (a moving average kept per process) and sends every
+``EXPLORE_EVERY``-th read round-robin so slower replicas are re-measured.
+
+Locally, two SQLite files can stand in for a primary and a replica; copy
+the primary file over the replica to "replicate"::
+
+    DATABASES['replica'] = {**DATABASES['default'], 'NAME': BASE_DIR / 'replica.sqlite3'}
+    REPLICA_DATABASES = ['replica']
+"""
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICATED_MODELS = {'website.Product', 'website.ProductImage'}
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+# Session set-up (SET, BEGIN, ...) and reads must not pin, or every new connection would.
+WRITE_STATEMENTS = {'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'ALTER', 'DROP', 'TRUNCATE'}
+EXPLORE_EVERY = 20
+SMOOTHING = 0.2
+ERROR_PENALTY = 1.0  # seconds; a failing replica looks this slow until it is measured again
+
+
+class _RequestState:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# Mutated, never replaced, during a request so that writes made inside
+# sync_to_async threads (which run on a copy of the context) still count.
+_state = ContextVar('replica_request_state', default=None)
+
+
+def replicas():
+    return getattr(settings, 'REPLICA_DATABASES', ())
+
+
+def pin_cookie():
+    return getattr(settings, 'REPLICA_PIN_COOKIE', 'db_pin')
+
+
+def begin_request(request):
+    pinned = request.method not in SAFE_METHODS or pin_cookie() in request.COOKIES
+    return _state.set(_RequestState(pinned))
+
+
+def end_request(token, response):
+    state = _state.get()
+    _state.reset(token)
+    if state.wrote and response is not None:
+        response.set_cookie(
+            pin_cookie(), '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5), httponly=True, samesite='Lax',
+        )
+    return response
+
+
+def pin():
+    """Read the primary for the rest of this request and the pin window after it."""
+    state = _state.get()
+    if state is not None:
+        state.pinned = state.wrote = True
+
+
+class _Selector:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turns = itertools.count()
+        self._latency = {}
+
+    def observe(self, alias, seconds):
+        with self._lock:
+            previous = self._latency.get(alias)
+            self._latency[alias] = seconds if previous is None else previous + SMOOTHING * (seconds - previous)
+
+    def choose(self, aliases, strategy):
+        turn = next(self._turns)
+        if strategy != 'least_latency':
+            return aliases[turn % len(aliases)]
+        if turn % EXPLORE_EVERY == 0:
+            return aliases[turn // EXPLORE_EVERY % len(aliases)]
+        with self._lock:
+            # Unmeasured replicas count as fastest, so each gets tried.
+            return min(aliases, key=lambda alias: self._latency.get(alias, 0.0))
+
+
+selector = _Selector()
+
+
+def _watch(execute, sql, params, many, context):
+    """Time replica queries; pin the request to the primary on its first write."""
+    state = _state.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    alias = context['connection'].alias
+    if alias in replicas():
+        started = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        except Exception:
+            selector.observe(alias, ERROR_PENALTY)
+            raise
+        selector.observe(alias, time.perf_counter() - started)
+        return result
+    if not state.wrote:
+        verb = sql.lstrip()[:10].split(None, 1)
+        if verb and verb[0].upper() in WRITE_STATEMENTS:
+            state.pinned = state.wrote = True
+    return execute(sql, params, many, context)
+
+
+def instrument(connection):
+    """Installed on every new connection (see the connection_created receiver)."""
+    if _watch not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _watch)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related lookups stay on the database the instance came from.
+            return instance._state.db
+        state = _state.get()
+        if state is None or state.pinned or model._meta.label not in REPLICATED_MODELS:
+            return None
+        aliases = replicas()
+        if not aliases or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return selector.choose(aliases, getattr(settings, 'REPLICA_SELECTION', 'round_robin'))
+
+    def db_for_write(self, model, **hints):
+        # Without this, saving an instance read from a replica would write to the replica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
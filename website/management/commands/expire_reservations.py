@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from website.services import checkout
+
+
+class Command(BaseCommand):
+    help = "Expire pending orders past their reservation and return their stock."
+
+    def handle(self, *args, **options):
+        expired = checkout.expire_reservations()
+        self.stdout.write(f"Expired {expired} order(s).")
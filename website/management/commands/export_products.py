@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website.services import export
+
+
+class Command(BaseCommand):
+    help = "Stream the full product catalog as a JSON array or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=export.FORMATS, default='ndjson')
+        parser.add_argument('--output', '-o', help="File to write; defaults to stdout.")
+        parser.add_argument('--gzip', action='store_true', help="Gzip-compress the output.")
+        parser.add_argument('--chunk-size', type=int, default=export.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be positive.")
+        chunks = export.iter_export(options['format'], options['chunk_size'])
+        if options['gzip']:
+            data = export.gzip_chunks(chunks)
+        else:
+            data = (chunk.encode() for chunk in chunks)
+
+        if not options['output']:
+            for block in data:
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
+            return
+        with open(options['output'], 'wb') as stream:
+            for block in data:
+                stream.write(block)
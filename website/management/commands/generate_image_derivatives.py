@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from website.models import ProductImage
+from website.services.images import generate_derivatives
+
+
+class Command(BaseCommand):
+    help = "Build resized JPEG/WebP derivatives for product images that lack them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Rebuild images that already have variants.")
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.order_by('id')
+        if not options['all']:
+            images = images.filter(variants={})
+        built = failed = 0
+        for image in images.iterator(chunk_size=200):
+            if generate_derivatives(image):
+                built += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {built} image(s); {failed} unreadable."))
@@ -0,0 +1,38 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website.services import product_import
+
+
+class Command(BaseCommand):
+    help = "Stream products from a CSV or NDJSON file into the catalog in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=product_import.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--max-errors', type=int, default=20, help="Row errors to print.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        reader = product_import.read_csv if file_format == 'csv' else product_import.read_ndjson
+
+        started = time.perf_counter()
+        with open(path, newline='', encoding='utf-8') as stream:
+            report = product_import.import_products(reader(stream), batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        for error in report['errors'][:options['max_errors']]:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']}, updated {report['updated']}, "
+            f"{len(report['errors'])} row error(s) in {elapsed:.1f}s."
+        ))
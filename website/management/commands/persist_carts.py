@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.services import cart_store
+
+
+class Command(BaseCommand):
+    help = "Copy carts changed in the cache store to Cart/CartItem (CART_STORE = 'cache')."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, metavar='SECONDS',
+                            help="Keep running, persisting every SECONDS instead of once.")
+
+    def handle(self, *args, **options):
+        persisted = 0
+        try:
+            while True:
+                persisted += cart_store.persist_dirty()
+                if not options['every']:
+                    break
+                time.sleep(options['every'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Persisted {persisted} cart(s).")
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.services import tasks
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the due tasks and exit.")
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        tasks.discover()
+        processed = 0
+        try:
+            while True:
+                count = tasks.run_pending(options['batch_size'])
+                processed += count
+                if count:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Processed {processed} task(s).")
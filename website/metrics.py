@@ -0,0 +1,177 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+Each process keeps its own registry, so scrape every worker (or run a single
+worker) when reading ``/metrics``.
+"""
+import threading
+from bisect import bisect_left
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + body + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name, self.help = name, help_text
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield self.name, key, value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets):
+        self.name, self.help = name, help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * len(self.buckets), 0, 0]
+        position = bisect_left(self.buckets, value)
+        if position < len(self.buckets):
+            series[0][position] += 1
+        series[1] += 1
+        series[2] += value
+
+    def samples(self):
+        for key, (counts, count, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key + (("le", _number(bound)),), cumulative
+            yield f"{self.name}_bucket", key + (("le", "+Inf"),), count
+            yield f"{self.name}_sum", key, total
+            yield f"{self.name}_count", key, count
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """``collector()`` yields ``(name, kind, help, value)`` gauges/counters at scrape time."""
+        self._collectors.append(collector)
+
+    def record(self, func, *args, **kwargs):
+        with self._lock:
+            func(*args, **kwargs)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric in self._metrics:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                for name, labels, value in metric.samples():
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for collector in self._collectors:
+            for name, kind, help_text, value in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            for metric in self._metrics:
+                if isinstance(metric, Histogram):
+                    metric._series.clear()
+                else:
+                    metric._values.clear()
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "http_requests_total", "Requests handled, by view, method and status."))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Wall time spent in the view and middleware below it.", DURATION_BUCKETS))
+request_queries = registry.register(Histogram(
+    "http_request_db_queries", "Database queries issued per request.", QUERY_BUCKETS))
+request_db_duration = registry.register(Histogram(
+    "http_request_db_duration_seconds", "Time spent executing database queries per request.", DURATION_BUCKETS))
+response_size = registry.register(Histogram(
+    "http_response_size_bytes", "Response body size; streaming responses are not measured.", SIZE_BUCKETS))
+budget_exceeded = registry.register(Counter(
+    "http_request_query_budget_exceeded_total", "Requests that issued more queries than their budget."))
+
+
+def _product_cache_stats():
+    from website.services import product_cache
+
+    stats = product_cache.stats()
+    yield "product_cache_hits_total", "counter", "Product read cache hits in this process.", stats["hits"]
+    yield "product_cache_misses_total", "counter", "Product read cache misses in this process.", stats["misses"]
+
+
+def _auth_cache_stats():
+    from website.services import auth_cache
+
+    stats = auth_cache.stats()
+    yield "auth_user_cache_hits_total", "counter", "API authentications served from a cached user.", stats["hits"]
+    yield "auth_user_cache_misses_total", "counter", "API authentications that loaded the user.", stats["misses"]
+
+
+def _db_pool_stats():
+    from website.db import pool
+
+    stats = pool.stats()
+    yield "db_pool_connections", "gauge", "Open pooled database connections in this process.", stats["connections"]
+    yield "db_pool_idle_connections", "gauge", "Pooled connections waiting to be checked out.", stats["idle"]
+    yield "db_pool_opened_total", "counter", "Database connections the pool has opened.", stats["opened"]
+    yield "db_pool_timeouts_total", "counter", "Checkouts that gave up waiting for a connection.", stats["timeouts"]
+
+
+registry.add_collector(_product_cache_stats)
+registry.add_collector(_auth_cache_stats)
+registry.add_collector(_db_pool_stats)
+
+
+def observe_request(view, method, status, duration, queries, db_duration, size):
+    def record():
+        requests_total.inc(view=view, method=method, status=status)
+        request_duration.observe(duration, view=view)
+        request_queries.observe(queries, view=view)
+        request_db_duration.observe(db_duration, view=view)
+        if size is not None:
+            response_size.observe(size, view=view)
+
+    registry.record(record)
+
+
+def observe_budget_exceeded(view):
+    registry.record(budget_exceeded.inc, view=view)
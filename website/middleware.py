@@ -0,0 +1,160 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from website import metrics
+from website.db import routers
+
+logger = logging.getLogger(__name__)
+
+# The current request's tracker. A context variable rather than a per-request
+# execute_wrapper because async views run their queries in sync_to_async
+# threads, on connection objects the middleware cannot reach; the context is
+# copied into those threads, the tracker with it.
+_current_tracker = ContextVar('request_query_tracker', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """Give a view its own query budget, overriding ``QUERY_BUDGET``."""
+    def decorate(view):
+        view.query_budget = limit
+        return view
+    return decorate
+
+
+class _QueryTracker:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def _record_query(execute, sql, params, many, context):
+    tracker = _current_tracker.get()
+    if tracker is None:
+        return execute(sql, params, many, context)
+    return tracker(execute, sql, params, many, context)
+
+
+def instrument(connection):
+    """Installed on every new connection (see the connection_created receiver)."""
+    if _record_query not in connection.execute_wrappers:
+        # First, so temporary wrappers that pop() themselves stay balanced.
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+def _budget_for(request):
+    match = getattr(request, 'resolver_match', None)
+    func = match.func if match else None
+    for target in (func, getattr(func, 'view_class', None)):
+        limit = getattr(target, 'query_budget', None)
+        if limit is not None:
+            return limit
+    return getattr(settings, 'QUERY_BUDGET', None)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record wall time, query count, database time and response size per view,
+    and log or raise when a request exceeds its query budget.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tracker = _QueryTracker()
+        token = _current_tracker.set(tracker)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_tracker.reset(token)
+        return self._record(request, response, tracker, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        tracker = _QueryTracker()
+        token = _current_tracker.set(tracker)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_tracker.reset(token)
+        return self._record(request, response, tracker, time.perf_counter() - started)
+
+    def _record(self, request, response, tracker, duration):
+        view = _view_name(request)
+        size = None if response.streaming else len(response.content)
+        metrics.observe_request(
+            view, request.method, response.status_code, duration, tracker.count, tracker.duration, size,
+        )
+
+        budget = _budget_for(request)
+        if budget is not None and tracker.count > budget:
+            metrics.observe_budget_exceeded(view)
+            message = f"{view} issued {tracker.count} queries (budget {budget}) for {request.method} {request.path}"
+            if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Scope catalog reads to the request for ``website.db.routers`` and set the
+    read-your-writes cookie on responses to requests that wrote.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.begin_request(request)
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            response = routers.end_request(token, response)
+        return response
+
+    async def __acall__(self, request):
+        token = routers.begin_request(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            response = routers.end_request(token, response)
+        return response
@@ -1,14 +1,20 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery, Sum
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
+from django.utils import timezone
 
 
 # --- Custom User ---
 class AuthUser(AbstractUser):
     email = models.EmailField(unique=True)
     username = models.CharField(max_length=150, unique=True)
+    # Bumped to revoke issued JWTs (website.services.auth_cache).
+    auth_version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.username
@@ -23,16 +29,65 @@ class Profile(models.Model):
 # -------------------------------
 # Product model
 # -------------------------------
+class ProductQuerySet(models.QuerySet):
+    def with_primary_image(self):
+        """Annotate each product with its first image path in the same query."""
+        first_image = ProductImage.objects.filter(product=OuterRef('pk')).order_by('id')
+        return self.annotate(
+            primary_image=Subquery(first_image.values('image')[:1]),
+            primary_variants=Subquery(first_image.values('variants')[:1], output_field=models.JSONField()),
+        )
+
+
 class Product(models.Model):
-    id=models.IntegerField(auto_created=True,primary_key=True)
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     description = models.TextField(blank=True, null=True)
     stock = models.PositiveIntegerField(default=0)  
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        # Sort and filter paths; the trailing id is the keyset tie-breaker.
+        indexes = [
+            models.Index(fields=['price', 'id'], name='product_price_id'),
+            models.Index(fields=['stock', 'id'], name='product_stock_id'),
+            models.Index(fields=['name', 'id'], name='product_name_id'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def _primary_image_fallback(self):
+        # Not loaded through with_primary_image(): fall back to a query.
+        if not hasattr(self, '_primary_image_row'):
+            self._primary_image_row = self.images.order_by('id').first()
+        return self._primary_image_row
+
+    @property
+    def primary_image_variants(self):
+        if hasattr(self, 'primary_variants'):
+            return self.primary_variants or {}
+        image = self._primary_image_fallback()
+        return image.variants if image else {}
+
+    @property
+    def primary_image_url(self):
+        if not hasattr(self, 'primary_image'):
+            image = self._primary_image_fallback()
+            return image.image.url if image else None
+        if not self.primary_image:
+            return None
+        return ProductImage._meta.get_field('image').storage.url(self.primary_image)
+
+    @property
+    def render_version(self):
+        """Changes with anything a product card shows; keys its cached fragment."""
+        # Derivatives are written without touching updated_at, so count them too.
+        derivatives = len(self.primary_image_variants.get('jpg', ()))
+        return f"{self.updated_at.timestamp()}:{self.primary_image_url}:{derivatives}"
+
 
 # -------------------------------
 # ProductImage model
@@ -40,16 +95,104 @@ class Product(models.Model):
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="images")
     image = models.ImageField(upload_to="product_images/")
+    # {"webp": [[width, name], ...], "jpg": [...]}, written by website.services.images
+    variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"Image for {self.product.name}"
 
+# -------------------------------
+# Background task queue (website.services.tasks)
+# -------------------------------
+class Task(models.Model):
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'], name='task_status_run_at')]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+# --- Product cache invalidation (covers the API views, ProductForm and admin) ---
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_product_cache(sender, instance, **kwargs):
+    from website.services import product_cache
+    product_cache.invalidate()
+
+# --- Image derivatives on upload ---
+@receiver(post_save, sender=ProductImage)
+def build_image_derivatives(sender, instance, **kwargs):
+    if not getattr(settings, 'PRODUCT_IMAGE_DERIVATIVES_ON_UPLOAD', True):
+        return
+    from website.tasks import build_image_derivatives as build
+    build.delay(instance.pk)
+
+
+# --- Search index maintenance ---
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    from website.services.search import index
+    transaction.on_commit(lambda: index.update(instance.pk, instance.name, instance.description))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    from website.services.search import index
+    pk = instance.pk
+    transaction.on_commit(lambda: index.remove(pk))
+
 # --- Token creation for AuthUser ---
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_auth_user_token(sender, instance, created, **kwargs):
     if created:
+        # Created inline: API clients expect a token as soon as the user exists,
+        # and a queued task would cost an INSERT of its own anyway.
         from rest_framework.authtoken.models import Token
         Token.objects.create(user=instance)
+
+
+# --- Cached auth snapshots (website.services.auth_cache) ---
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_auth_snapshot(sender, instance, created, **kwargs):
+    from website.services import auth_cache
+    # _password is set from set_password() until the save completes.
+    if not created and (instance._password is not None or not instance.is_active):
+        auth_cache.revoke(instance)
+    else:
+        auth_cache.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def drop_auth_snapshot(sender, instance, **kwargs):
+    from website.services import auth_cache
+    auth_cache.invalidate(instance.pk)
+
+
+@receiver(user_logged_out)
+def revoke_tokens_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        from website.services import auth_cache
+        auth_cache.revoke(user)
+
+
+@receiver(post_delete, sender='authtoken.Token')
+def forget_auth_token(sender, instance, **kwargs):
+    from website.services import auth_cache
+    auth_cache.forget_token(instance.key)
 #---cart---
 class Cart(models.Model):
     user = models.OneToOneField(
@@ -61,7 +204,7 @@ class Cart(models.Model):
 
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.items.aggregate(total=Sum('quantity'))['total'] or 0
 
     def __str__(self):
         return f"Cart({self.user.username})"
@@ -72,6 +215,67 @@ class CartItem(models.Model):
     product = models.ForeignKey('Product', on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
+
+# --- Orders (website.services.checkout) ---
+class Order(models.Model):
+    PENDING, PAID, CANCELLED, EXPIRED = 'pending', 'paid', 'cancelled', 'expired'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (PAID, 'Paid'), (CANCELLED, 'Cancelled'), (EXPIRED, 'Expired')]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='orders', on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    # Stock stays reserved for a pending order until this moment.
+    reserved_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'reserved_until'], name='order_status_reserved')]
+
+    def __str__(self):
+        return f"Order #{self.pk} ({self.status})"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    # Name and price as they were at checkout.
+    name = models.CharField(max_length=100)
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.name} x {self.quantity}"
+
+
+# --- Per-request query metrics (website.middleware) and replica routing (website.db.routers) ---
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    from website.db import routers
+    from website.middleware import instrument
+    instrument(connection)
+    routers.instrument(connection)
+
+
+# --- Guest carts join the user's cart on login (website.services.cart) ---
+@receiver(user_logged_in)
+def merge_guest_cart(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        from website.services.cart import merge_guest_cart as merge
+        merge(request, user)
+
+
+# --- Cart summary invalidation for writes outside the cart service (admin, cascades) ---
+@receiver([post_save, post_delete], sender=CartItem)
+def invalidate_cart_summary(sender, instance, **kwargs):
+    from website.services.cart import invalidate_summary
+    invalidate_summary(Cart.objects.filter(pk=instance.cart_id).values_list('user_id', flat=True).first())
+
     
 # class Cart(models.Model):
 #     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="cart")
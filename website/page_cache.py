@@ -0,0 +1,73 @@
+"""
+Full-page cache for anonymous storefront pages.
+
+``anonymous_page_cache`` serves ``GET``/``HEAD`` requests that carry no
+session or messages cookie from the cache, keyed by path, query string and
+catalog version, so any product write retires every cached page (see
+``website.services.product_cache``). Requests with a session cookie, which
+covers every logged-in shopper, render normally: their pages show their
+cart, and a per-session copy would rarely be read twice.
+
+A response is only stored when it is a 200 that sets no cookies and did
+not use a CSRF token, so one visitor's token or session never reaches
+another.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from website.services import product_cache
+
+MESSAGES_COOKIE = 'messages'
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def _cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES and MESSAGES_COOKIE not in request.COOKIES
+
+
+def _cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not response.has_header('Cache-Control')
+    )
+
+
+def _key(request):
+    raw = f"{request.path}?{request.META.get('QUERY_STRING', '')}"
+    return f"page:v{product_cache.catalog_version()}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def anonymous_page_cache(view):
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60)
+        if not timeout or not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+        cache = _cache()
+        key = _key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = view(request, *args, **kwargs)
+            if _cacheable_response(request, response):
+                cache.set(key, (response.content, response['Content-Type']), timeout)
+        # Logged-in visitors get a different page at the same URL.
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    return inner
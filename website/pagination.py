@@ -0,0 +1,188 @@
+"""
+Keyset (cursor) pagination shared by the product listings.
+
+Pages are addressed by an opaque cursor wrapping the boundary ``id`` and a
+direction flag, so every page is a single ``WHERE id > %s ORDER BY id LIMIT n``
+query however deep the client scrolls. Listings sorted on another column
+(``ordering='-price'``) keep the boundary row's value and the sort field in
+the cursor too and page with ``WHERE (price, id) < (%s, %s)``, written out
+as an OR so the ``(price, id)`` index serves it; a cursor is rejected under
+any other ordering. The same helpers back the HTML views, the
+plain ``JsonResponse`` API and the DRF API.
+"""
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def encode_cursor(position, reverse=False, value=None, field=None):
+    data = {'p': position, 'r': int(reverse)}
+    if value is not None:
+        data['v'] = str(value) if isinstance(value, Decimal) else value
+        data['f'] = field
+    raw = json.dumps(data, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(data['p']), bool(data.get('r')), data.get('v'), data.get('f')
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError) as exc:
+        raise InvalidCursor('Invalid cursor.') from exc
+
+
+def decode_cursor(token):
+    position, reverse, _, _ = _decode(token)
+    return position, reverse
+
+
+def get_page_size(request):
+    """Read ``?page_size=`` and clamp it to ``PRODUCT_MAX_PAGE_SIZE``."""
+    default = getattr(settings, 'PRODUCT_PAGE_SIZE', 24)
+    maximum = getattr(settings, 'PRODUCT_MAX_PAGE_SIZE', 100)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def get_fields(request, allowed):
+    """Read the ``?fields=id,name,price`` sparse fieldset, defaulting to ``allowed``."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(allowed)
+    fields = list(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise InvalidFields('Unknown field(s): ' + ', '.join(unknown))
+    return fields
+
+
+class CursorPage:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _value(row, field):
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+def _coerce(model, field, value):
+    # The value ends up in a WHERE clause; a tampered one must be a 400, not a 500.
+    if not isinstance(value, (str, int, float)):
+        raise InvalidCursor('Invalid cursor.')
+    try:
+        return model._meta.get_field(field).to_python(value)
+    except ValidationError as exc:
+        raise InvalidCursor('Invalid cursor.') from exc
+
+
+def _window(queryset, cursor, page_size, ordering):
+    page_size = page_size or getattr(settings, 'PRODUCT_PAGE_SIZE', 24)
+    position, reverse, value, cursor_field = _decode(cursor) if cursor else (None, False, None, None)
+    field = ordering.lstrip('-')
+    if position is not None:
+        if (cursor_field or 'id') != field:
+            raise InvalidCursor('Cursor does not match the ordering.')
+        if field != 'id':
+            value = _coerce(queryset.model, field, value)
+
+    # Previous pages walk the ordering backwards from the first row shown.
+    descending = ordering.startswith('-') != reverse
+    sign, lookup = ('-', 'lt') if descending else ('', 'gt')
+    if field == 'id':
+        queryset = queryset.order_by(f'{sign}id')
+        if position is not None:
+            queryset = queryset.filter(**{f'id__{lookup}': position})
+    else:
+        queryset = queryset.order_by(f'{sign}{field}', f'{sign}id')
+        if position is not None:
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': position})
+            )
+
+    # Fetch one extra row to learn whether another page exists.
+    return queryset[:page_size + 1], page_size, position, reverse, field, value
+
+
+def _page(rows, page_size, position, reverse, field, value):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+        has_next, has_previous = position is not None, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    def cursor(row, reverse=False):
+        return encode_cursor(
+            _value(row, 'id'), reverse=reverse,
+            value=_value(row, field) if field != 'id' else None, field=field,
+        )
+
+    # An empty page past either end points back at the boundary it started from.
+    next_cursor = previous_cursor = None
+    if has_next:
+        next_cursor = cursor(rows[-1]) if rows else encode_cursor(position, value=value, field=field)
+    if has_previous:
+        previous_cursor = cursor(rows[0], reverse=True) if rows else encode_cursor(position, True, value, field)
+    return CursorPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+
+def paginate(queryset, cursor=None, page_size=None, ordering='id'):
+    """Return one ``CursorPage`` of ``queryset`` sorted by ``ordering`` (then ``id``)."""
+    window, *state = _window(queryset, cursor, page_size, ordering)
+    return _page(list(window), *state)
+
+
+async def apaginate(queryset, cursor=None, page_size=None, ordering='id'):
+    """``paginate()`` for async views, fetching rows with ``async for``."""
+    window, *state = _window(queryset, cursor, page_size, ordering)
+    return _page([row async for row in window], *state)
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri('?' + params.urlencode())
+
+
+def page_links(request, page):
+    return {
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    }
@@ -0,0 +1,190 @@
+"""
+Cached user lookups for API authentication.
+
+Every authenticated API request used to load its ``AuthUser`` row (and, for
+``Token`` auth, the token row too). ``get_user(pk)`` serves a snapshot of
+the user instead, from two layers:
+
+- a per-process dict, trusted for ``AUTH_USER_LOCAL_TTL`` seconds;
+- the shared cache (``AUTH_CACHE_ALIAS``), for ``AUTH_USER_CACHE_TIMEOUT``
+  seconds, under a key made of the user id and a per-user generation
+  counter. Any save or delete of the user bumps the generation (see the
+  receivers in ``website.models``), retiring the entry everywhere, including
+  one a concurrent request was still filling with the old row.
+
+Revoking issued JWTs needs a counter that survives cache eviction, so it is
+a column: ``AuthUser.auth_version``. Tokens carry it in their
+``auth_version`` claim, and ``revoke(user)`` increments it on a password
+change, on deactivation and on logout (see ``website.api.authentication``).
+Other processes notice within ``AUTH_USER_LOCAL_TTL`` seconds.
+
+Snapshots are loaded without the password hash.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+
+from website.models import AuthUser
+
+_local_lock = threading.Lock()
+_local = OrderedDict()
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _cache():
+    return caches[getattr(settings, "AUTH_CACHE_ALIAS", "default")]
+
+
+def _timeout():
+    return getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 300)
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def _generation_key(pk):
+    return f"auth-user-generation:{pk}"
+
+
+def _generation(pk):
+    cache = _cache()
+    key = _generation_key(pk)
+    generation = cache.get(key)
+    if generation is None:
+        # Seeded from the clock, like the catalog version: an evicted counter
+        # must not restart below a generation that still has an entry.
+        cache.add(key, time.time_ns() // 1000, None)
+        generation = cache.get(key)
+    return generation
+
+
+def _bump_generation(pk):
+    cache = _cache()
+    key = _generation_key(pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns() // 1000, None)
+
+
+def _forget_local(pk):
+    with _local_lock:
+        _local.pop(pk, None)
+
+
+def _remember_local(pk, user):
+    ttl = getattr(settings, "AUTH_USER_LOCAL_TTL", 5)
+    if not ttl:
+        return
+    with _local_lock:
+        _local[pk] = (time.monotonic() + ttl, user)
+        _local.move_to_end(pk)
+        while len(_local) > getattr(settings, "AUTH_USER_LOCAL_MAX", 10000):
+            _local.popitem(last=False)
+
+
+def _from_local(pk):
+    with _local_lock:
+        entry = _local.get(pk)
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1]
+
+
+def get_user(pk):
+    """
+    A copy of the ``AuthUser`` with ``pk``, raising ``AuthUser.DoesNotExist``
+    if absent. Each caller gets its own copy, so per-request state such as
+    the permission cache is never shared between requests.
+    """
+    pk = int(pk)
+    user = _from_local(pk)
+    if user is None:
+        cache = _cache()
+        key = f"auth-user:g{_generation(pk)}:{pk}"
+        user = cache.get(key)
+        if user is None:
+            _count("misses")
+            user = AuthUser.objects.using(DEFAULT_DB_ALIAS).defer("password").get(pk=pk)
+            cache.set(key, user, _timeout())
+        else:
+            _count("hits")
+        _remember_local(pk, user)
+    else:
+        _count("hits")
+    return copy.copy(user)
+
+
+def invalidate(pk):
+    """Drop the snapshot of user ``pk`` now and again once the current transaction commits."""
+    _bump_generation(pk)
+    _forget_local(pk)
+
+    def after_commit():
+        _bump_generation(pk)
+        _forget_local(pk)
+
+    transaction.on_commit(after_commit)
+
+
+def revoke(user):
+    """Invalidate every token issued to ``user`` so far."""
+    AuthUser.objects.filter(pk=user.pk).update(auth_version=F("auth_version") + 1)
+    if "auth_version" in user.__dict__:
+        user.auth_version += 1
+    invalidate(user.pk)
+
+
+# -------------------------
+# DRF Token keys
+# -------------------------
+def _token_key(key):
+    # Keys are credentials; never store them in the cache in the clear.
+    return "auth-token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def token_user_id(key):
+    """The user id that DRF ``Token`` ``key`` belongs to, or ``None``."""
+    from rest_framework.authtoken.models import Token
+
+    cache = _cache()
+    cache_key = _token_key(key)
+    user_id = cache.get(cache_key)
+    if user_id is None:
+        user_id = Token.objects.using(DEFAULT_DB_ALIAS).filter(key=key).values_list("user_id", flat=True).first()
+        if user_id is None:
+            return None
+        cache.set(cache_key, user_id, _timeout())
+    return user_id
+
+
+def forget_token(key):
+    cache = _cache()
+    cache.delete(_token_key(key))
+    transaction.on_commit(lambda: cache.delete(_token_key(key)))
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+
+def reset():
+    """Forget every per-process snapshot and the counters (tests)."""
+    with _local_lock:
+        _local.clear()
+    with _stats_lock:
+        _stats["hits"] = _stats["misses"] = 0
@@ -0,0 +1,209 @@
+"""
+Shopping carts for logged-in and anonymous shoppers.
+
+A cart belongs to an owner: the user, or a ``Guest`` identified by a random
+cart id kept in the session (the id survives the session key being cycled
+at login). ``CART_STORE`` picks where logged-in users' carts live,
+``"orm"`` (``Cart``/``CartItem`` rows) or ``"cache"``; guest carts always
+live in the cache (see ``website.services.cart_store``). Logging in merges
+the guest cart into the user's (``merge_guest_cart``).
+
+The navbar summary is cached per owner and rebuilt after every change,
+once the change commits when the store is the database.
+"""
+import uuid
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from website.models import Product
+from website.services import product_cache
+from website.services.cart_store import CartBusy, OrmCartStore, OutOfStock, owner_key, store_for  # noqa: F401
+
+SESSION_KEY = '_cart_id'
+
+
+class Guest:
+    """An anonymous shopper with a cart."""
+    is_authenticated = False
+    pk = None
+
+    def __init__(self, cart_id):
+        self.cart_id = cart_id
+
+
+def cart_owner(request, create=False):
+    """The user, the session's ``Guest``, or ``None`` for a guest without a cart."""
+    if request.user.is_authenticated:
+        return request.user
+    if not hasattr(request, 'session'):
+        return None
+    cart_id = request.session.get(SESSION_KEY)
+    if cart_id is None:
+        if not create:
+            return None
+        cart_id = request.session[SESSION_KEY] = uuid.uuid4().hex
+    return Guest(cart_id)
+
+
+async def acart_owner(request):
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    cart_id = await request.session.aget(SESSION_KEY)
+    return Guest(cart_id) if cart_id is not None else None
+
+
+# -------------------------
+# Cached cart summary
+# -------------------------
+def _summary_key(key):
+    return f"cart-summary:{key}"
+
+
+def _summary_timeout():
+    return getattr(settings, 'CART_SUMMARY_TIMEOUT', 900)
+
+
+def _summarize(rows):
+    lines = [
+        {
+            'product_id': row['product_id'],
+            'name': row['product__name'],
+            'price': row['product__price'],
+            'quantity': row['quantity'],
+        }
+        for row in rows
+    ]
+    return {
+        'count': sum(line['quantity'] for line in lines),
+        'total': sum((line['price'] * line['quantity'] for line in lines), Decimal('0.00')),
+        'lines': lines,
+    }
+
+
+def build_summary(owner):
+    return _summarize(store_for(owner).summary_rows(owner))
+
+
+def get_summary(owner):
+    """Item count, total price and lines for the navbar, served from cache."""
+    summary = cache.get(_summary_key(owner_key(owner)))
+    if summary is None:
+        summary = refresh_summary(owner)
+    return summary
+
+
+async def aget_summary(owner):
+    """``get_summary()`` for async views."""
+    key = _summary_key(owner_key(owner))
+    summary = await cache.aget(key)
+    if summary is None:
+        store = store_for(owner)
+        if store.transactional:
+            summary = _summarize([row async for row in store.summary_rows(owner)])
+        else:
+            summary = await sync_to_async(build_summary)(owner)
+        await cache.aset(key, summary, _summary_timeout())
+    return summary
+
+
+def refresh_summary(owner):
+    summary = build_summary(owner)
+    cache.set(_summary_key(owner_key(owner)), summary, _summary_timeout())
+    return summary
+
+
+def invalidate_summary(user_id):
+    cache.delete(_summary_key(user_id))
+
+
+def _refresh_summary_after(owner, store):
+    if store.transactional:
+        transaction.on_commit(lambda: refresh_summary(owner))
+    else:
+        refresh_summary(owner)
+
+
+# -------------------------
+# Reads and mutations
+# -------------------------
+def get_cart(user):
+    return OrmCartStore().get_cart(user)
+
+
+def get_lines(owner):
+    """``[(product_id, quantity), ...]`` in the order they were added."""
+    return store_for(owner).lines(owner)
+
+
+def get_items(owner):
+    """Lines with their product, for rendering; each has ``id``, ``product`` and ``quantity``."""
+    if owner is None:
+        return []
+    return store_for(owner).items(owner)
+
+
+async def aget_items(owner):
+    if owner is None:
+        return []
+    store = store_for(owner)
+    if store.transactional:
+        return await store.aitems(owner)
+    return await sync_to_async(store.items)(owner)
+
+
+def add_item(owner, product, quantity=1):
+    """Add ``quantity`` of ``product`` to the cart, never exceeding stock."""
+    store = store_for(owner)
+    store.add(owner, product, quantity)
+    _refresh_summary_after(owner, store)
+
+
+def update_item(owner, line_id, quantity):
+    """Set a cart line to ``quantity``; zero or less removes it."""
+    store = store_for(owner)
+    updated = store.update(owner, line_id, quantity)
+    _refresh_summary_after(owner, store)
+    return updated
+
+
+def remove_item(owner, product_id):
+    store = store_for(owner)
+    removed = store.remove(owner, product_id)
+    _refresh_summary_after(owner, store)
+    return removed
+
+
+def clear(owner):
+    """Empty the cart; call inside the transaction that consumed it."""
+    store = store_for(owner)
+    store.clear(owner)
+    transaction.on_commit(lambda: refresh_summary(owner))
+
+
+def merge_guest_cart(request, user):
+    """
+    Move the session's guest cart into ``user``'s cart, adding quantities
+    up to the available stock. Called on login.
+    """
+    cart_id = request.session.pop(SESSION_KEY, None)
+    if cart_id is None:
+        return
+    guest = Guest(cart_id)
+    held = dict(get_lines(user))
+    for product_id, quantity in get_lines(guest):
+        try:
+            product = product_cache.get_product(product_id)
+        except Product.DoesNotExist:
+            continue
+        quantity = min(quantity, product.stock - held.get(product_id, 0))
+        if quantity > 0:
+            try:
+                add_item(user, product, quantity)
+            except OutOfStock:
+                pass
+    clear(guest)
@@ -0,0 +1,341 @@
+"""
+Where cart lines live.
+
+``OrmCartStore`` keeps them as ``Cart``/``CartItem`` rows. Quantities are
+changed with ``UPDATE ... SET quantity = quantity + n`` guarded by the
+product's stock, and new lines rely on the unique ``(cart, product)``
+constraint instead of a read-then-write, so concurrent clicks neither lose
+increments nor push a line past the available stock.
+
+``CacheCartStore`` keeps each cart as one cache entry, ``{product_id:
+quantity}``, changed under a short per-cart lock, so a cart click costs a
+few cache round trips and no SQL. Products are read through the product
+cache and stock is only checked loosely; checkout takes the stock under row
+locks either way (see ``website.services.checkout``). Logged-in users'
+carts are written behind: a cart's first change since it was last
+persisted sets its own ``cart-dirty:<user id>`` flag and appends the user
+id to a log numbered by ``cache.incr()``, so writers share no lock. A
+single ``persist_dirty()`` (``manage.py persist_carts``) reads the log from
+where it stopped and copies those carts to ``Cart``/``CartItem``, which is
+also where a cart evicted from the cache is reloaded from. Changes made
+since the last run are lost if the cache evicts the cart first.
+
+Lines are identified by ``CartItem`` id in the ORM store and by product id
+in the cache store; ``items()`` exposes them as ``.id``.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F, Subquery
+
+from website.models import Cart, CartItem, Product
+from website.services import product_cache
+
+DIRTY_KEY = 'cart-dirty'  # cart-dirty:<user id>, set until the cart is persisted
+LOG_KEY = 'cart-dirty-log'  # cart-dirty-log:<seq> holds a user id
+LOG_SEQ_KEY = 'cart-dirty-seq'
+LOG_CURSOR_KEY = 'cart-dirty-cursor'  # (next seq to read, whether it was missing last run)
+LOCK_TIMEOUT = 5  # seconds; a lock left by a crashed worker expires after this
+LOCK_WAIT = 2
+
+
+class OutOfStock(Exception):
+    def __init__(self, product):
+        self.product = product
+        super().__init__(f"{product.name} is out of stock!")
+
+
+class CartBusy(Exception):
+    def __init__(self):
+        super().__init__("Your cart is being updated elsewhere; please try again.")
+
+
+def owner_key(owner):
+    """``"<user id>"`` for a user, ``"guest:<cart id>"`` for an anonymous shopper."""
+    return str(owner.pk) if owner.is_authenticated else f"guest:{owner.cart_id}"
+
+
+# -------------------------
+# ORM store
+# -------------------------
+class OrmCartStore:
+    transactional = True
+
+    def get_cart(self, user):
+        cart, _ = Cart.objects.get_or_create(user=user)
+        return cart
+
+    def _increment(self, cart, product, quantity):
+        # Guarded by the stock column, not the (possibly cached) product passed in.
+        stock = Subquery(Product.objects.filter(pk=product.pk).values('stock'))
+        return CartItem.objects.filter(
+            cart=cart, product=product, quantity__lte=stock - quantity,
+        ).update(quantity=F('quantity') + quantity)
+
+    def lines(self, user):
+        return list(CartItem.objects.filter(cart__user=user).order_by('id').values_list('product_id', 'quantity'))
+
+    def items(self, user):
+        return list(CartItem.objects.filter(cart__user=user).select_related('product').order_by('id'))
+
+    async def aitems(self, user):
+        return [item async for item in CartItem.objects.filter(cart__user=user).select_related('product').order_by('id')]
+
+    def summary_rows(self, user):
+        return (
+            CartItem.objects.filter(cart__user=user)
+            .order_by('id')
+            .values('product_id', 'product__name', 'product__price', 'quantity')
+        )
+
+    @transaction.atomic
+    def add(self, user, product, quantity):
+        cart = self.get_cart(user)
+        if self._increment(cart, product, quantity):
+            return
+        if not Product.objects.filter(pk=product.pk, stock__gte=quantity).exists():
+            raise OutOfStock(product)
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+            return
+        except IntegrityError:
+            # The line already exists: either another request inserted it first
+            # or it is already at the stock limit.
+            pass
+        if not self._increment(cart, product, quantity):
+            raise OutOfStock(product)
+
+    @transaction.atomic
+    def update(self, user, line_id, quantity):
+        items = CartItem.objects.filter(id=line_id, cart__in=Cart.objects.filter(user=user))
+        if quantity <= 0:
+            if not items.delete()[0]:
+                raise CartItem.DoesNotExist
+            return 0
+        updated = items.filter(
+            product__in=Product.objects.filter(stock__gte=quantity),
+        ).update(quantity=quantity)
+        if not updated:
+            item = items.select_related('product').get()
+            raise OutOfStock(item.product)
+        return updated
+
+    @transaction.atomic
+    def remove(self, user, product_id):
+        return CartItem.objects.filter(
+            cart__in=Cart.objects.filter(user=user), product_id=product_id,
+        ).delete()[0]
+
+    def clear(self, user):
+        CartItem.objects.filter(cart__user=user).delete()
+
+
+# -------------------------
+# Cache store
+# -------------------------
+class CartLine:
+    """A cache store line, shaped like the ``CartItem`` fields templates use."""
+
+    def __init__(self, product, quantity):
+        self.id = product.pk
+        self.product = product
+        self.quantity = quantity
+
+
+def _cache():
+    return caches[getattr(settings, 'CART_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'CART_CACHE_TIMEOUT', 14 * 24 * 3600)
+
+
+@contextmanager
+def _locked(key):
+    """Hold ``key``'s lock, raising ``CartBusy`` if it stays taken for ``LOCK_WAIT`` seconds."""
+    cache = _cache()
+    lock, token = f"{key}:lock", uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT
+    # cache.add() is atomic on every backend.
+    while not cache.add(lock, token, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            raise CartBusy()
+        time.sleep(0.002)
+    try:
+        yield
+    finally:
+        # Only release our own lock: if we overran LOCK_TIMEOUT, it may belong to another writer now.
+        if cache.get(lock) == token:
+            cache.delete(lock)
+
+
+class CacheCartStore:
+    transactional = False
+
+    def _key(self, owner):
+        return f"cart:{owner_key(owner)}"
+
+    def _load(self, owner):
+        lines = _cache().get(self._key(owner))
+        if lines is None:
+            lines = {}
+            if owner.is_authenticated:
+                # Evicted or never cached: start from the last persisted copy.
+                lines = dict(OrmCartStore().lines(owner))
+                _cache().add(self._key(owner), lines, _timeout())
+        return lines
+
+    def _save(self, owner, lines):
+        _cache().set(self._key(owner), lines, _timeout())
+        if owner.is_authenticated:
+            _mark_dirty(owner.pk)
+
+    def lines(self, owner):
+        return list(self._load(owner).items())
+
+    def items(self, owner):
+        lines = self._load(owner)
+        products = product_cache.get_many(lines)
+        return [CartLine(products[pk], quantity) for pk, quantity in lines.items() if pk in products]
+
+    def summary_rows(self, owner):
+        return [
+            {'product_id': line.product.pk, 'product__name': line.product.name,
+             'product__price': line.product.price, 'quantity': line.quantity}
+            for line in self.items(owner)
+        ]
+
+    def add(self, owner, product, quantity):
+        key = self._key(owner)
+        with _locked(key):
+            # The product cache entry, which stock changes retire, rather than the caller's copy.
+            try:
+                stock = product_cache.get_product(product.pk).stock
+            except Product.DoesNotExist:
+                raise OutOfStock(product)
+            lines = self._load(owner)
+            total = lines.get(product.pk, 0) + quantity
+            if total > stock:
+                raise OutOfStock(product)
+            lines[product.pk] = total
+            self._save(owner, lines)
+
+    def update(self, owner, line_id, quantity):
+        with _locked(self._key(owner)):
+            lines = self._load(owner)
+            if line_id not in lines:
+                raise CartItem.DoesNotExist
+            if quantity <= 0:
+                del lines[line_id]
+            else:
+                try:
+                    product = product_cache.get_product(line_id)
+                except Product.DoesNotExist:
+                    raise CartItem.DoesNotExist
+                if product.stock < quantity:
+                    raise OutOfStock(product)
+                lines[line_id] = quantity
+            self._save(owner, lines)
+        return 0 if quantity <= 0 else 1
+
+    def remove(self, owner, product_id):
+        with _locked(self._key(owner)):
+            lines = self._load(owner)
+            if lines.pop(product_id, None) is None:
+                return 0
+            self._save(owner, lines)
+        return 1
+
+    def clear(self, owner):
+        if owner.is_authenticated:
+            OrmCartStore().clear(owner)
+        key = self._key(owner)
+        # After a rollback (e.g. a failed checkout) the cart must survive.
+        transaction.on_commit(lambda: _cache().delete(key))
+
+
+# -------------------------
+# Write-behind persistence
+# -------------------------
+def persist(user_id, lines):
+    """Make ``user_id``'s ``Cart``/``CartItem`` rows match ``lines``."""
+    lines = dict(lines)
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user_id=user_id)
+        existing = set(Product.objects.filter(pk__in=lines).values_list('pk', flat=True))
+        items = [CartItem(cart=cart, product_id=pk, quantity=quantity) for pk, quantity in lines.items() if pk in existing]
+        features = connections[router.db_for_write(CartItem)].features
+        if features.supports_update_conflicts_with_target:
+            CartItem.objects.filter(cart=cart).exclude(product_id__in=existing).delete()
+            CartItem.objects.bulk_create(
+                items, update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity'],
+            )
+        else:
+            # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target: replace the rows instead.
+            CartItem.objects.filter(cart=cart).delete()
+            CartItem.objects.bulk_create(items)
+
+
+def _mark_dirty(user_id):
+    cache = _cache()
+    # Set after the cart itself: a persister that clears the flag first then
+    # either reads this change or sees the flag again.
+    if not cache.add(f"{DIRTY_KEY}:{user_id}", 1, None):
+        return
+    try:
+        seq = cache.incr(LOG_SEQ_KEY)
+    except ValueError:
+        cache.add(LOG_SEQ_KEY, 0, None)
+        seq = cache.incr(LOG_SEQ_KEY)
+    cache.set(f"{LOG_KEY}:{seq}", user_id, None)
+
+
+def persist_dirty():
+    """Copy every cart logged dirty since the last run to the database; returns how many."""
+    cache = _cache()
+    start, waited = cache.get(LOG_CURSOR_KEY) or (1, False)
+    end = cache.get(LOG_SEQ_KEY) or 0
+    if end < start - 1:
+        # The counter was evicted and started again.
+        start, waited = 1, False
+    keys = {seq: f"{LOG_KEY}:{seq}" for seq in range(start, end + 1)}
+    entries = cache.get_many(keys.values())
+    # A missing entry may be one a writer has numbered but not stored yet:
+    # stop there and give it one more run before skipping it as evicted.
+    stop = next(
+        (seq for seq, key in keys.items() if key not in entries and not (seq == start and waited)), end + 1,
+    )
+    persisted = set()
+    for seq in range(start, stop):
+        user_id = entries.get(keys[seq])
+        if user_id is None or user_id in persisted:
+            continue
+        cache.delete(f"{DIRTY_KEY}:{user_id}")
+        try:
+            lines = cache.get(f"cart:{user_id}")
+            if lines is not None:
+                persist(user_id, lines)
+        except Exception:
+            # Resume from this entry so the next run retries it.
+            cache.set(LOG_CURSOR_KEY, (seq, False), None)
+            cache.delete_many([keys[done] for done in range(start, seq)])
+            raise
+        persisted.add(user_id)
+    cache.set(LOG_CURSOR_KEY, (stop, stop <= end), None)
+    cache.delete_many([keys[done] for done in range(start, stop)])
+    return len(persisted)
+
+
+STORES = {'orm': OrmCartStore(), 'cache': CacheCartStore()}
+
+
+def store_for(owner):
+    """Anonymous carts have no ``Cart`` row to live in, so they always use the cache."""
+    if not owner.is_authenticated:
+        return STORES['cache']
+    return STORES[getattr(settings, 'CART_STORE', 'orm')]
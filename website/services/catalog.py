@@ -0,0 +1,274 @@
+"""
+Filtering, sorting and facets for the product listing APIs.
+
+``parse(request.GET)`` validates ``min_price``, ``max_price``, ``in_stock``
+and ``ordering`` (``id``, ``price`` or ``name``, ``-`` for descending) into a
+``ListingQuery``. Pages come from ``website.pagination`` with the same
+ordering, so keyset cursors stay stable and each sort is served by its
+``(column, id)`` index.
+
+``?facets=1`` adds product counts per price bucket (``PRODUCT_PRICE_BUCKETS``)
+and by availability, from one grouped aggregate. Each facet ignores its own
+filter, so a client can show how many products the other buckets hold.
+
+``?ids=1,2,3`` (or a POST of ``{"ids": [...]}``) fetches specific products
+instead, in the order asked for, through the product read cache.
+
+Pages and facets are cached under the normalized query (parameters in a
+fixed order, canonical values, defaults dropped) plus the catalog version,
+so any product write retires them (see ``website.services.product_cache``).
+"""
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import BooleanField, Case, Count, IntegerField, Q, Value, When
+
+from website.models import Product
+from website.pagination import apaginate, paginate
+from website.services import product_cache
+
+ORDERINGS = ('id', '-id', 'price', '-price', 'name', '-name')
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+class ListingQuery:
+    def __init__(self, min_price=None, max_price=None, in_stock=None, ordering='id'):
+        self.min_price = min_price
+        self.max_price = max_price
+        self.in_stock = in_stock
+        self.ordering = ordering
+
+    @property
+    def sort_field(self):
+        return self.ordering.lstrip('-')
+
+    def price_filter(self):
+        condition = Q()
+        if self.min_price is not None:
+            condition &= Q(price__gte=self.min_price)
+        if self.max_price is not None:
+            condition &= Q(price__lte=self.max_price)
+        return condition
+
+    def stock_filter(self):
+        if self.in_stock is None:
+            return Q()
+        return Q(stock__gt=0) if self.in_stock else Q(stock=0)
+
+    def apply(self, queryset):
+        return queryset.filter(self.price_filter() & self.stock_filter())
+
+    def normalized(self, ordering=True):
+        params = [
+            ('in_stock', None if self.in_stock is None else int(self.in_stock)),
+            ('max_price', _canonical(self.max_price)),
+            ('min_price', _canonical(self.min_price)),
+            ('ordering', self.ordering if ordering and self.ordering != 'id' else None),
+        ]
+        return urlencode([(name, value) for name, value in params if value is not None])
+
+
+def _canonical(amount):
+    return None if amount is None else format(amount.normalize(), 'f')
+
+
+def _price(params, name):
+    raw = params.get(name, '').strip()
+    if not raw:
+        return None
+    try:
+        amount = Decimal(raw)
+    except InvalidOperation:
+        raise InvalidQuery(f"{name} must be a number.")
+    if not amount.is_finite() or amount < 0:
+        raise InvalidQuery(f"{name} must be a number of zero or more.")
+    return amount
+
+
+def _flag(params, name):
+    raw = params.get(name, '').strip().lower()
+    if not raw:
+        return None
+    if raw in TRUE_VALUES:
+        return True
+    if raw in FALSE_VALUES:
+        return False
+    raise InvalidQuery(f"{name} must be true or false.")
+
+
+def parse(params):
+    """Build a ``ListingQuery`` from request parameters, raising ``InvalidQuery``."""
+    ordering = params.get('ordering') or 'id'
+    if ordering not in ORDERINGS:
+        raise InvalidQuery(f"ordering must be one of {', '.join(ORDERINGS)}.")
+    query = ListingQuery(_price(params, 'min_price'), _price(params, 'max_price'), _flag(params, 'in_stock'), ordering)
+    if query.min_price is not None and query.max_price is not None and query.min_price > query.max_price:
+        raise InvalidQuery("min_price must not be greater than max_price.")
+    return query
+
+
+def wants_facets(params):
+    return _flag(params, 'facets') is True
+
+
+def parse_ids(raw):
+    """
+    Product ids for a batch read, from ``"1,2,3"`` or a JSON list, in the
+    order given without repeats. Raises ``InvalidQuery``.
+    """
+    if isinstance(raw, str):
+        raw = [part for part in raw.split(',') if part.strip()]
+    if not isinstance(raw, list) or not raw:
+        raise InvalidQuery("ids must be a non-empty list of product ids.")
+    try:
+        ids = list(dict.fromkeys(int(str(pk).strip()) for pk in raw))
+    except ValueError:
+        raise InvalidQuery("ids must be whole numbers.")
+    limit = getattr(settings, 'PRODUCT_BATCH_MAX_IDS', 200)
+    if len(ids) > limit:
+        raise InvalidQuery(f"At most {limit} ids per request.")
+    return ids
+
+
+def batch_ids(request):
+    """
+    The ids of a batch read: ``?ids=`` on GET, or ``{"ids": [...]}`` (or a
+    form-encoded ``ids``) in a POST body for lists too long for a URL.
+    Returns ``None`` when the request is not a batch read.
+    """
+    if request.method == 'POST':
+        if request.content_type == 'application/json':
+            try:
+                body = json.loads(request.body or b'{}')
+            except ValueError:
+                raise InvalidQuery("Request body must be JSON.")
+            raw = body.get('ids') if isinstance(body, dict) else None
+        else:
+            raw = request.POST.get('ids')
+        return parse_ids(raw)
+    if 'ids' in request.GET:
+        return parse_ids(request.GET['ids'])
+    return None
+
+
+def batch_payload(ids, products, serialize):
+    """Results in requested order, ``None`` where a product does not exist, plus the missing ids."""
+    return {
+        'results': [serialize(products[pk]) if pk in products else None for pk in ids],
+        'missing': [pk for pk in ids if pk not in products],
+    }
+
+
+# -------------------------
+# Cached pages and facets
+# -------------------------
+def _cache():
+    return caches[getattr(settings, 'PRODUCT_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'PRODUCT_LIST_CACHE_TIMEOUT', 60)
+
+
+def _key(kind, version, *parts):
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f"product-{kind}:v{version}:{digest}"
+
+
+def _page_key(version, query, cursor, page_size, variant):
+    return _key('page', version, query.normalized(), cursor or '', page_size, variant)
+
+
+def get_page(queryset, query, cursor, page_size, variant=''):
+    """
+    One ``CursorPage`` of ``query`` applied to ``queryset``. ``variant`` must
+    name whatever else shapes the rows, such as the selected fields.
+    """
+    cache = _cache()
+    key = _page_key(product_cache.catalog_version(), query, cursor, page_size, variant)
+    page = cache.get(key)
+    if page is None:
+        page = paginate(query.apply(queryset), cursor, page_size, ordering=query.ordering)
+        cache.set(key, page, _timeout())
+    return page
+
+
+async def aget_page(queryset, query, cursor, page_size, variant=''):
+    """``get_page()`` for async views."""
+    cache = _cache()
+    key = _page_key(await product_cache.acatalog_version(), query, cursor, page_size, variant)
+    page = await cache.aget(key)
+    if page is None:
+        page = await apaginate(query.apply(queryset), cursor, page_size, ordering=query.ordering)
+        await cache.aset(key, page, _timeout())
+    return page
+
+
+def price_buckets():
+    return tuple(Decimal(str(bound)) for bound in getattr(settings, 'PRODUCT_PRICE_BUCKETS', (100, 500, 1000, 5000)))
+
+
+def _facet_rows(query, bounds):
+    """One row per (price bucket, availability) pair, counted with and without the price filter."""
+    bucket = Case(
+        *(When(price__lt=bound, then=Value(index)) for index, bound in enumerate(bounds)),
+        default=Value(len(bounds)),
+        output_field=IntegerField(),
+    )
+    available = Case(When(stock__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField())
+    return (
+        Product.objects.annotate(bucket=bucket, available=available)
+        .values('bucket', 'available')
+        .annotate(count=Count('id'), in_price_range=Count('id', filter=query.price_filter()))
+        .order_by()
+    )
+
+
+def _summarize(rows, query, bounds):
+    by_bucket = [0] * (len(bounds) + 1)
+    availability = {'in_stock': 0, 'out_of_stock': 0}
+    for row in rows:
+        if query.in_stock is None or row['available'] == query.in_stock:
+            by_bucket[row['bucket']] += row['count']
+        availability['in_stock' if row['available'] else 'out_of_stock'] += row['in_price_range']
+    edges = [Decimal('0'), *bounds, None]
+    price = [
+        {'min': _canonical(edges[index]), 'max': _canonical(edges[index + 1]), 'count': count}
+        for index, count in enumerate(by_bucket)
+    ]
+    return {'price': price, 'availability': availability}
+
+
+def _facets_key(version, query, bounds):
+    return _key('facets', version, query.normalized(ordering=False), *bounds)
+
+
+def get_facets(query):
+    cache = _cache()
+    bounds = price_buckets()
+    key = _facets_key(product_cache.catalog_version(), query, bounds)
+    facets = cache.get(key)
+    if facets is None:
+        facets = _summarize(list(_facet_rows(query, bounds)), query, bounds)
+        cache.set(key, facets, _timeout())
+    return facets
+
+
+async def aget_facets(query):
+    cache = _cache()
+    bounds = price_buckets()
+    key = _facets_key(await product_cache.acatalog_version(), query, bounds)
+    facets = await cache.aget(key)
+    if facets is None:
+        facets = _summarize([row async for row in _facet_rows(query, bounds)], query, bounds)
+        await cache.aset(key, facets, _timeout())
+    return facets
@@ -0,0 +1,159 @@
+"""
+Checkout: turn a cart into an order while reserving its stock.
+
+Stock is taken at checkout, not when an item is added to the cart. The
+products in the cart are locked with ``SELECT ... FOR UPDATE`` in primary-key
+order, so two checkouts sharing products always queue on the same first row
+instead of deadlocking, and then decremented with a single guarded
+``UPDATE ... WHERE stock >= quantity``. The order stays ``pending`` until
+``reserved_until``; ``expire_reservations()`` (``manage.py
+expire_reservations``) hands the stock of unpaid orders back.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from website.models import Order, OrderItem, Product
+from website.services import cart as cart_service
+from website.services import product_cache
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCart(CheckoutError):
+    def __init__(self):
+        super().__init__("Your cart is empty.")
+
+
+class InsufficientStock(CheckoutError):
+    def __init__(self, products):
+        self.products = products
+        names = ", ".join(product.name for product in products)
+        super().__init__(f"Not enough stock for {names}.")
+
+
+class OrderNotPending(CheckoutError):
+    def __init__(self, order):
+        self.order = order
+        super().__init__(f"Order #{order.pk} is {order.status}.")
+
+
+def reservation_timeout():
+    return timedelta(seconds=getattr(settings, 'ORDER_RESERVATION_TIMEOUT', 900))
+
+
+def _adjust_stock(quantities, sign):
+    """
+    Apply ``stock + sign * quantity`` to every product in one UPDATE; when
+    taking stock, rows without enough are left alone. Returns the row count.
+    """
+    ordered = sorted(quantities.items())
+    products = Product.objects.filter(pk__in=[pk for pk, _ in ordered])
+    if sign < 0:
+        guard = Q()
+        for pk, quantity in ordered:
+            guard |= Q(pk=pk, stock__gte=quantity)
+        products = products.filter(guard)
+    # .update() skips auto_now and post_save, so stamp and invalidate by hand.
+    # Only these products' entries: a catalog-wide bump per order would empty
+    # the listing and page caches too (see website.services.product_cache).
+    updated = products.update(
+        stock=Case(*(When(pk=pk, then=F('stock') + sign * quantity) for pk, quantity in ordered)),
+        updated_at=timezone.now(),
+    )
+    product_cache.forget(quantities)
+    return updated
+
+
+@transaction.atomic
+def checkout(user):
+    """Create a pending order from the user's cart and reserve its stock."""
+    lines = sorted(cart_service.get_lines(user))
+    if not lines:
+        raise EmptyCart()
+    quantities = dict(lines)
+    # Deterministic lock order: always ascending primary key.
+    products = {
+        product.pk: product
+        for product in Product.objects.select_for_update().filter(pk__in=quantities).order_by('pk')
+    }
+    # A cache-backed cart can still name a product deleted since it was added.
+    lines = [(pk, quantity) for pk, quantity in lines if pk in products]
+    if not lines:
+        raise EmptyCart()
+    quantities = dict(lines)
+    short = [products[pk] for pk, quantity in lines if products[pk].stock < quantity]
+    if short:
+        raise InsufficientStock(short)
+    if _adjust_stock(quantities, -1) != len(quantities):
+        # Only reachable where row locks are not enforced; the guard held.
+        raise InsufficientStock([products[pk] for pk in quantities])
+
+    order = Order.objects.create(
+        user=user,
+        total=sum((products[pk].price * quantity for pk, quantity in lines), Decimal('0.00')),
+        reserved_until=timezone.now() + reservation_timeout(),
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, product=products[pk], name=products[pk].name, price=products[pk].price,
+                  quantity=quantity)
+        for pk, quantity in lines
+    )
+    cart_service.clear(user)
+    return order
+
+
+def _locked_pending(order_id):
+    order = Order.objects.select_for_update().get(pk=order_id)
+    if order.status != Order.PENDING:
+        raise OrderNotPending(order)
+    return order
+
+
+def _release(order, status):
+    quantities = {}
+    for product_id, quantity in order.items.values_list('product_id', 'quantity'):
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if quantities:
+        _adjust_stock(quantities, +1)
+    order.status = status
+    order.save(update_fields=['status', 'updated_at'])
+    return order
+
+
+def mark_paid(order_id):
+    with transaction.atomic():
+        order = _locked_pending(order_id)
+        if not order.reserved_until or order.reserved_until > timezone.now():
+            order.status = Order.PAID
+            order.save(update_fields=['status', 'updated_at'])
+            return order
+        # Too late: release the stock (committed) and refuse the payment.
+        _release(order, Order.EXPIRED)
+    raise OrderNotPending(order)
+
+
+@transaction.atomic
+def cancel(order_id):
+    return _release(_locked_pending(order_id), Order.CANCELLED)
+
+
+def expire_reservations(now=None):
+    """Release the stock of pending orders whose reservation ran out."""
+    now = now or timezone.now()
+    due = Order.objects.filter(status=Order.PENDING, reserved_until__lte=now).values_list('pk', flat=True)
+    expired = 0
+    for order_id in list(due):
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(pk=order_id)
+            # Paid or cancelled since the scan: nothing to release.
+            if order.status == Order.PENDING:
+                _release(order, Order.EXPIRED)
+                expired += 1
+    return expired
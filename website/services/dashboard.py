@@ -0,0 +1,89 @@
+"""
+Dashboard statistics computed with aggregate queries.
+
+``get_stats()`` answers from a short-lived cache entry; on a miss it runs one
+aggregate per table (products, users, cart lines), so its cost does not grow
+with the number of rows the dashboard used to render. Writes do not
+invalidate the entry, so the figures may lag by up to
+``DASHBOARD_STATS_TIMEOUT`` seconds. The lists shown next to the statistics
+are bounded ``LIMIT`` queries.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+
+from website.models import CartItem, Product
+
+STATS_KEY = "dashboard-stats"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def low_stock_threshold():
+    return _setting('DASHBOARD_LOW_STOCK_THRESHOLD', 5)
+
+
+def _money(expression):
+    return ExpressionWrapper(expression, output_field=DecimalField(max_digits=20, decimal_places=2))
+
+
+def compute_stats():
+    threshold = low_stock_threshold()
+    products = Product.objects.aggregate(
+        count=Count('id'),
+        inventory_value=Sum(_money(F('price') * F('stock'))),
+        low_stock=Count('id', filter=Q(stock__gt=0, stock__lt=threshold)),
+        out_of_stock=Count('id', filter=Q(stock=0)),
+    )
+    carts = CartItem.objects.aggregate(
+        carts=Count('cart', distinct=True),
+        items=Sum('quantity'),
+        value=Sum(_money(F('quantity') * F('product__price'))),
+    )
+    return {
+        'products': products['count'],
+        'inventory_value': products['inventory_value'] or Decimal('0.00'),
+        'low_stock': products['low_stock'],
+        'out_of_stock': products['out_of_stock'],
+        'users': get_user_model().objects.count(),
+        'active_carts': carts['carts'],
+        'cart_items': carts['items'] or 0,
+        'cart_value': carts['value'] or Decimal('0.00'),
+    }
+
+
+def get_stats():
+    """Dashboard statistics, at most ``DASHBOARD_STATS_TIMEOUT`` seconds old."""
+    stats = cache.get(STATS_KEY)
+    if stats is None:
+        stats = compute_stats()
+        cache.set(STATS_KEY, stats, _setting('DASHBOARD_STATS_TIMEOUT', 60))
+    return stats
+
+
+# -------------------------
+# Top-N lists
+# -------------------------
+def _limit(limit):
+    return limit or _setting('DASHBOARD_TOP_N', 8)
+
+
+def recent_products(limit=None):
+    return Product.objects.with_primary_image().order_by('-updated_at', '-id')[:_limit(limit)]
+
+
+def low_stock_products(limit=None):
+    return (
+        Product.objects.with_primary_image()
+        .filter(stock__lt=low_stock_threshold())
+        .order_by('stock', 'id')[:_limit(limit)]
+    )
+
+
+def recent_users(limit=None):
+    return get_user_model().objects.order_by('-id').only('id', 'username', 'email')[:_limit(limit)]
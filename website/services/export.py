@@ -0,0 +1,86 @@
+"""
+Streaming catalog export as a JSON array or NDJSON.
+
+Rows are read in keyset batches (``WHERE id > last ORDER BY id LIMIT n``)
+rather than with a bare ``.iterator()``: mysqlclient buffers a whole result
+set client-side, so only bounded queries keep worker memory flat on MySQL.
+"""
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from website.models import Product
+
+EXPORT_FIELDS = ('id', 'name', 'price', 'description', 'stock')
+FORMATS = ('json', 'ndjson')
+DEFAULT_CHUNK_SIZE = 2000
+
+_encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+def iter_batches(chunk_size=DEFAULT_CHUNK_SIZE, fields=EXPORT_FIELDS):
+    queryset = Product.objects.order_by('id').values(*fields)
+    last_id = None
+    while True:
+        batch = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        rows = list(batch[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]['id']
+
+
+def iter_ndjson(batches):
+    for rows in batches:
+        yield ''.join(_encoder.encode(row) + '\n' for row in rows)
+
+
+def iter_json(batches):
+    yield '['
+    first = True
+    for rows in batches:
+        body = ','.join(_encoder.encode(row) for row in rows)
+        yield body if first else ',' + body
+        first = False
+    yield ']'
+
+
+def iter_export(export_format='json', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield encoded text chunks of the whole catalog, one per batch."""
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}; expected one of {', '.join(FORMATS)}.")
+    batches = iter_batches(chunk_size)
+    return iter_ndjson(batches) if export_format == 'ndjson' else iter_json(batches)
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an ``Accept-Encoding`` header allows gzip, honouring q-values (``gzip;q=0`` refuses it)."""
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    quality = qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0)))
+    return quality > 0
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of text chunks into a single gzip member on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
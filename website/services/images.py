@@ -0,0 +1,82 @@
+"""
+Resized JPEG and WebP derivatives for product images.
+
+Derivatives live next to the original upload and embed a hash of the
+original's bytes, e.g. ``product_images/lamp.3f2a9c1e7b44.320w.webp``, so a
+re-upload under the same name never serves a stale variant and the files can
+be cached forever. Their names are recorded on ``ProductImage.variants`` and
+rendered as ``srcset`` by the ``product_images`` template tags.
+"""
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from website.models import ProductImage
+
+logger = logging.getLogger(__name__)
+
+FORMATS = (("webp", "WEBP"), ("jpg", "JPEG"))
+
+
+def _widths():
+    return sorted(getattr(settings, "PRODUCT_IMAGE_WIDTHS", (160, 320, 640)))
+
+
+def derivative_name(original, digest, width, extension):
+    stem, _ = posixpath.splitext(original)
+    return f"{stem}.{digest}.{width}w.{extension}"
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    quality = getattr(settings, "PRODUCT_IMAGE_QUALITY", 80)
+    image.save(buffer, image_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def generate_derivatives(product_image):
+    """
+    Write any missing derivatives for ``product_image`` and record them on its
+    ``variants`` field. Returns the variants mapping, or ``{}`` if the original
+    cannot be read as an image.
+    """
+    field = product_image.image
+    if not field.name:
+        return {}
+    storage = field.storage
+    try:
+        with storage.open(field.name, "rb") as stream:
+            data = stream.read()
+        source = Image.open(BytesIO(data))
+        source = ImageOps.exif_transpose(source).convert("RGB")
+    except (OSError, UnidentifiedImageError):
+        logger.warning("Could not build derivatives for %s", field.name, exc_info=True)
+        return {}
+
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    # Never upscale: widths beyond the original collapse to the original width.
+    widths = sorted({min(width, source.width) for width in _widths()})
+    variants = {extension: [] for extension, _ in FORMATS}
+    for width in widths:
+        height = max(1, round(source.height * width / source.width))
+        resized = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+        for extension, image_format in FORMATS:
+            name = derivative_name(field.name, digest, width, extension)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(_encode(resized, image_format)))
+            variants[extension].append([width, name])
+
+    # A queryset update keeps post_save (and this pipeline) from re-triggering.
+    ProductImage.objects.filter(pk=product_image.pk).update(variants=variants)
+    product_image.variants = variants
+    return variants
+
+
+def srcset(variants, extension, storage=None):
+    storage = storage or ProductImage._meta.get_field("image").storage
+    return ", ".join(f"{storage.url(name)} {width}w" for width, name in variants.get(extension, []))
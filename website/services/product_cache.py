@@ -0,0 +1,171 @@
+"""
+Read-through cache for single products.
+
+Entries are keyed by product id plus a catalog version counter. Any save or
+delete of a ``Product`` or ``ProductImage`` bumps the version (see the
+receivers in ``website.models``), which retires every cached entry at once
+without having to know which keys exist. Stock changes made by checkout
+use ``forget(pks)`` instead, which drops only those products' entries:
+listings, facets and cached pages keep theirs and show the new stock once
+they expire (``PRODUCT_LIST_CACHE_TIMEOUT``, ``PAGE_CACHE_TIMEOUT``), so an
+order does not empty every catalog cache. The backend is whichever cache
+alias ``PRODUCT_CACHE_ALIAS`` names; locmem unless configured otherwise.
+Misses always read the primary database, never a replica.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from website.models import Product
+
+VERSION_KEY = "product-catalog-version"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _cache():
+    return caches[getattr(settings, "PRODUCT_CACHE_ALIAS", "default")]
+
+
+def _timeout():
+    return getattr(settings, "PRODUCT_CACHE_TIMEOUT", 3600)
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def catalog_version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never restarts below a
+        # version that may still have live entries.
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    cache = _cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        return cache.get(VERSION_KEY)
+
+
+def invalidate():
+    """Retire cached products now and again once the current transaction commits."""
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+def forget(pks):
+    """Drop the cached entries of ``pks`` now and again once the current transaction commits."""
+    pks = list(pks)
+
+    def drop():
+        version = catalog_version()
+        _cache().delete_many([product_key(pk, version) for pk in pks])
+
+    drop()
+    transaction.on_commit(drop)
+
+
+def product_key(pk, version=None):
+    return f"product:v{version or catalog_version()}:{pk}"
+
+
+def get_product(pk):
+    """Return the ``Product`` with ``pk``, raising ``Product.DoesNotExist`` if absent."""
+    cache = _cache()
+    key = product_key(pk)
+    product = cache.get(key)
+    if product is not None:
+        _count("hits")
+        return product
+    _count("misses")
+    # Fill from the primary: a lagging replica's row would be cached for the full timeout.
+    product = Product.objects.using(DEFAULT_DB_ALIAS).get(pk=pk)
+    cache.set(key, product, _timeout())
+    return product
+
+
+def get_many(pks):
+    """
+    ``{pk: Product}`` for every pk in ``pks`` that exists: cache hits from one
+    multi-get, the rest from one ``in_bulk`` query, which also fills the cache.
+    """
+    cache = _cache()
+    version = catalog_version()
+    keys = {pk: product_key(pk, version) for pk in pks}
+    cached = cache.get_many(keys.values())
+    products = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [pk for pk in keys if pk not in products]
+    with _stats_lock:
+        _stats["hits"] += len(products)
+        _stats["misses"] += len(missing)
+    if missing:
+        loaded = Product.objects.using(DEFAULT_DB_ALIAS).in_bulk(missing)
+        cache.set_many({keys[pk]: product for pk, product in loaded.items()}, _timeout())
+        products.update(loaded)
+    return products
+
+
+async def acatalog_version():
+    cache = _cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns() // 1000, None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+async def aget_product(pk):
+    """``get_product()`` for async views."""
+    cache = _cache()
+    key = product_key(pk, await acatalog_version())
+    product = await cache.aget(key)
+    if product is not None:
+        _count("hits")
+        return product
+    _count("misses")
+    product = await Product.objects.using(DEFAULT_DB_ALIAS).aget(pk=pk)
+    await cache.aset(key, product, _timeout())
+    return product
+
+
+async def aget_many(pks):
+    """``get_many()`` for async views."""
+    cache = _cache()
+    version = await acatalog_version()
+    keys = {pk: product_key(pk, version) for pk in pks}
+    cached = await cache.aget_many(keys.values())
+    products = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [pk for pk in keys if pk not in products]
+    with _stats_lock:
+        _stats["hits"] += len(products)
+        _stats["misses"] += len(missing)
+    if missing:
+        loaded = await Product.objects.using(DEFAULT_DB_ALIAS).ain_bulk(missing)
+        await cache.aset_many({keys[pk]: product for pk, product in loaded.items()}, _timeout())
+        products.update(loaded)
+    return products
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats["hits"] = _stats["misses"] = 0
@@ -0,0 +1,115 @@
+"""
+Batched product import.
+
+Rows are validated with ``ProductBulkSerializer(many=True)`` one batch at a
+time and written with ``bulk_create``/``bulk_update`` inside a transaction
+per batch, so a large load streams through in constant memory and an invalid
+row only costs its own entry in the error report.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from website.api.serialization.product_serializer import ProductBulkSerializer
+from website.models import Product
+from website.services import product_cache
+from website.services.search import index as search_index
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        # Blank cells fall back to serializer defaults rather than failing.
+        yield {key: value for key, value in row.items() if key and value != ''}
+
+
+def read_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield ValidationError({'non_field_errors': [f"Invalid JSON: {exc}"]})
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _write_batch(valid):
+    # Later rows win when a batch repeats an id.
+    updates = {}
+    creates = []
+    for data in valid:
+        if data.get('id') is not None:
+            updates[data['id']] = data
+        else:
+            creates.append(Product(**data))
+
+    existing = Product.objects.in_bulk(updates)
+    now = timezone.now()
+    # Only the columns a row carries are written; rows are grouped by that
+    # column set so each group is one bulk_update.
+    to_update = {}
+    for pk, data in updates.items():
+        product = existing.get(pk)
+        if product is None:
+            creates.append(Product(**data))
+            continue
+        for field, value in data.items():
+            setattr(product, field, value)
+        product.updated_at = now
+        fields = tuple(sorted(data.keys() - {'id'})) + ('updated_at',)
+        to_update.setdefault(fields, []).append(product)
+
+    with transaction.atomic():
+        Product.objects.bulk_create(creates)
+        for fields, products in to_update.items():
+            Product.objects.bulk_update(products, fields)
+    return len(creates), sum(len(products) for products in to_update.values())
+
+
+def import_products(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Validate and write ``rows`` (dicts, or ``ValidationError`` for unparsable
+    input) and return ``{'created', 'updated', 'errors'}`` where each error
+    carries the zero-based row index.
+    """
+    report = {'created': 0, 'updated': 0, 'errors': []}
+    validator = ProductBulkSerializer(many=True).child
+    offset = 0
+    for batch in _batches(rows, batch_size):
+        valid = []
+        for index, row in enumerate(batch, start=offset):
+            try:
+                if isinstance(row, ValidationError):
+                    raise row
+                if not isinstance(row, dict):
+                    raise ValidationError({'non_field_errors': ["Expected an object."]})
+                valid.append(validator.run_validation(row))
+            except ValidationError as exc:
+                report['errors'].append({'row': index, 'errors': exc.detail})
+        offset += len(batch)
+        if valid:
+            created, updated = _write_batch(valid)
+            report['created'] += created
+            report['updated'] += updated
+
+    # bulk_create/bulk_update bypass post_save, so retire cached products and
+    # the search index here; the index rebuilds on the next search.
+    if report['created'] or report['updated']:
+        product_cache.invalidate()
+        search_index.invalidate()
+    return report
@@ -0,0 +1,286 @@
+"""
+In-process inverted index over ``Product.name`` and ``description``.
+
+The index is built in a background thread the first time a search arrives
+(building from ``AppConfig.ready()`` would query the database before
+migrations or the test database exist) and is then kept current by the
+``Product`` receivers in ``website.models``. Until it is warm, searches fall
+back to ``icontains`` queries.
+
+Each worker process has its own index, and the receivers only update the
+index of the process that made the write. So every write (and every
+``invalidate()``) also increments a version counter in the shared cache
+(``PRODUCT_CACHE_ALIAS``), and each search compares it with the version its
+index reflects. An index that missed another process's write is dropped and
+rebuilt, with searches going to the database meanwhile. With a per-process
+cache backend such as locmem, workers cannot see each other's counters and
+serve stale results until restarted; use a shared backend with several
+workers.
+
+Every query term must match; each term also matches as a prefix of longer
+tokens, at half weight. Name hits count ``NAME_WEIGHT`` times a description
+hit, scaled by inverse document frequency.
+"""
+import bisect
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from functools import reduce
+from operator import and_
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Q
+
+from website.models import Product
+from website.services.export import iter_batches
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+NAME_WEIGHT = 3.0
+PREFIX_WEIGHT = 0.5
+BUILD_BATCH_SIZE = 2000
+VERSION_KEY = "product-search-index-version"
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def _weights(name, description):
+    weights = defaultdict(float)
+    for token in tokenize(name):
+        weights[token] += NAME_WEIGHT
+    for token in tokenize(description):
+        weights[token] += 1.0
+    return weights
+
+
+def _cache():
+    return caches[getattr(settings, "PRODUCT_CACHE_ALIAS", "default")]
+
+
+def shared_version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seeded from the clock, like the catalog version, so a restarted
+        # counter never matches a version an index already reflects.
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump_shared_version():
+    cache = _cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        return cache.get(VERSION_KEY)
+
+
+class ProductIndex:
+    COLD, BUILDING, WARM = "cold", "building", "warm"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.state = self.COLD
+        self._generation = 0
+        self._version = None     # the shared version this index reflects
+        self._build_writes = []  # shared versions of local writes made during a build
+        self._reset()
+
+    def _reset(self):
+        self._postings = defaultdict(dict)   # token -> {product_id: weight}
+        self._documents = {}                 # product_id -> tokens, for removal
+        self._vocabulary = []                # sorted tokens, for prefix lookups
+        self._pending = []
+
+    @property
+    def is_warm(self):
+        return self.state == self.WARM
+
+    def __len__(self):
+        return len(self._documents)
+
+    # ---- building ----
+    def warm(self, background=True):
+        """Start a build unless one is running or the index is already warm."""
+        with self._lock:
+            if self.state != self.COLD:
+                return
+            self.state = self.BUILDING
+            self._pending, self._build_writes = [], []
+            generation = self._generation
+            # Read before the snapshot: writes after it show up as a newer version.
+            version = shared_version()
+        if background:
+            threading.Thread(
+                target=self._build, args=(generation, version), name="product-search-index", daemon=True,
+            ).start()
+        else:
+            self._build(generation, version)
+
+    def _build(self, generation, version):
+        postings, documents = defaultdict(dict), {}
+        try:
+            for rows in iter_batches(BUILD_BATCH_SIZE, fields=('id', 'name', 'description')):
+                for row in rows:
+                    weights = _weights(row['name'], row['description'])
+                    documents[row['id']] = tuple(weights)
+                    for token, weight in weights.items():
+                        postings[token][row['id']] = weight
+        except Exception:
+            logger.exception("Building the product search index failed; staying on database search.")
+            with self._lock:
+                if generation == self._generation:
+                    self.state = self.COLD
+            return
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+
+        with self._lock:
+            if generation != self._generation:
+                return  # invalidated mid-build; the snapshot may predate bulk writes
+            pending, self._pending = self._pending, []
+            self._postings, self._documents = postings, documents
+            self._vocabulary = sorted(postings)
+            self.state = self.WARM
+            # Writes that landed while the snapshot was being read win.
+            for action, args in pending:
+                action(*args)
+            self._version = version
+            for written in sorted(self._build_writes):
+                if written == self._version + 1:
+                    self._version = written
+
+    def _drop(self):
+        with self._lock:
+            self._generation += 1
+            self.state = self.COLD
+            self._version = None
+            self._reset()
+
+    def invalidate(self):
+        """Drop the index in every process, e.g. after bulk writes that bypass signals."""
+        self._drop()
+        _bump_shared_version()
+
+    def sync(self):
+        """Drop a warm index that missed writes made by another process."""
+        if self.is_warm and shared_version() != self._version:
+            self._drop()
+
+    def _note_write(self):
+        version = _bump_shared_version()
+        with self._lock:
+            if self.state == self.BUILDING:
+                self._build_writes.append(version)
+            elif self.state == self.WARM and self._version is not None and version == self._version + 1:
+                # Nobody else wrote since this index was last current.
+                self._version = version
+
+    # ---- incremental updates ----
+    def update(self, product_id, name, description):
+        with self._lock:
+            if self.state == self.BUILDING:
+                self._pending.append((self._update, (product_id, name, description)))
+            elif self.state == self.WARM:
+                self._update(product_id, name, description)
+        self._note_write()
+
+    def remove(self, product_id):
+        with self._lock:
+            if self.state == self.BUILDING:
+                self._pending.append((self._remove, (product_id,)))
+            elif self.state == self.WARM:
+                self._remove(product_id)
+        self._note_write()
+
+    def _remove(self, product_id):
+        for token in self._documents.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                position = bisect.bisect_left(self._vocabulary, token)
+                if position < len(self._vocabulary) and self._vocabulary[position] == token:
+                    del self._vocabulary[position]
+
+    def _update(self, product_id, name, description):
+        self._remove(product_id)
+        weights = _weights(name, description)
+        self._documents[product_id] = tuple(weights)
+        for token, weight in weights.items():
+            if token not in self._postings:
+                bisect.insort(self._vocabulary, token)
+            self._postings[token][product_id] = weight
+
+    # ---- querying ----
+    def _expand(self, term):
+        vocabulary = self._vocabulary
+        position = bisect.bisect_left(vocabulary, term)
+        while position < len(vocabulary) and vocabulary[position].startswith(term):
+            yield vocabulary[position]
+            position += 1
+
+    def _term_scores(self, term, total):
+        scores = None
+        for token in self._expand(term):
+            postings = self._postings[token]
+            factor = math.log(1 + total / len(postings)) * (1.0 if token == term else PREFIX_WEIGHT)
+            if scores is None:
+                scores = {pk: weight * factor for pk, weight in postings.items()}
+            else:
+                for pk, weight in postings.items():
+                    scores[pk] = scores.get(pk, 0.0) + weight * factor
+        return scores or {}
+
+    def search(self, query, limit=20):
+        """Return up to ``limit`` product ids, best match first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            total = max(len(self._documents), 1)
+            per_term = sorted((self._term_scores(term, total) for term in terms), key=len)
+        # Intersect starting from the most selective term.
+        scores = per_term[0]
+        for other in per_term[1:]:
+            if not scores:
+                break
+            scores = {pk: score + other[pk] for pk, score in scores.items() if pk in other}
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [product_id for product_id, _ in best]
+
+
+index = ProductIndex()
+
+
+def database_search(query, limit=20):
+    terms = tokenize(query)
+    if not terms:
+        return []
+    condition = reduce(and_, (Q(name__icontains=term) | Q(description__icontains=term) for term in terms))
+    return list(Product.objects.filter(condition).order_by('id').values_list('id', flat=True)[:limit])
+
+
+def search(query, limit=20):
+    """Return ``(product_ids, source)``; ``source`` is ``"index"`` or ``"database"``."""
+    if not getattr(settings, 'PRODUCT_SEARCH_INDEX', True):
+        return database_search(query, limit), "database"
+    index.sync()
+    if index.is_warm:
+        return index.search(query, limit), "index"
+    index.warm()
+    return database_search(query, limit), "database"
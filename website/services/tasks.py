@@ -0,0 +1,126 @@
+"""
+A small database-backed task queue.
+
+``@task`` registers a function and gives it ``.delay(*args, **kwargs)``.
+The queued ``Task`` row is inserted inside the caller's transaction, so the
+job becomes visible to workers exactly when the primary write commits and is
+discarded if it rolls back. ``manage.py run_tasks`` claims due rows, runs
+them and retries failures with exponential backoff.
+
+With ``TASKS_EAGER = True`` nothing is queued: the function runs in-process
+via ``transaction.on_commit`` instead, which suits development without a
+worker.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from website.models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class UnknownTask(LookupError):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task(func=None, *, max_attempts=5):
+    """Register ``func`` as a background task and attach ``.delay()``."""
+    def decorate(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        registry[name] = func
+
+        def delay(*args, **kwargs):
+            return enqueue(name, args, kwargs, max_attempts=max_attempts)
+
+        func.task_name = name
+        func.delay = delay
+        return func
+
+    return decorate(func) if func is not None else decorate
+
+
+def enqueue(name, args=(), kwargs=None, max_attempts=5, run_at=None):
+    kwargs = kwargs or {}
+    if _setting('TASKS_EAGER', False):
+        func = registry[name]
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return None
+    return Task.objects.create(
+        name=name, args=list(args), kwargs=kwargs, max_attempts=max_attempts,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def backoff(attempt):
+    """Seconds to wait before retry number ``attempt`` (1-based)."""
+    base = _setting('TASK_RETRY_BACKOFF', 10)
+    return min(base * 2 ** (attempt - 1), _setting('TASK_RETRY_BACKOFF_MAX', 3600))
+
+
+def claim(batch_size=10):
+    """Atomically mark up to ``batch_size`` due tasks as running and return them."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=_setting('TASK_RUNNING_TIMEOUT', 600))
+    with transaction.atomic():
+        # Tasks left running by a worker that died are picked up again.
+        Task.objects.filter(status=Task.RUNNING, updated_at__lt=stale).update(status=Task.QUEUED, updated_at=now)
+        due = Task.objects.filter(status=Task.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        tasks = list(due[:batch_size])
+        for item in tasks:
+            item.status = Task.RUNNING
+            item.attempts += 1
+            item.updated_at = now  # bulk_update skips auto_now
+        Task.objects.bulk_update(tasks, ['status', 'attempts', 'updated_at'])
+    return tasks
+
+
+def execute(item):
+    """Run one claimed task, recording success, a scheduled retry or failure."""
+    try:
+        func = registry.get(item.name)
+        if func is None:
+            raise UnknownTask(f"No task registered as {item.name!r}.")
+        func(*item.args, **item.kwargs)
+    except Exception:
+        item.last_error = traceback.format_exc()
+        if item.attempts < item.max_attempts:
+            item.status = Task.QUEUED
+            item.run_at = timezone.now() + timedelta(seconds=backoff(item.attempts))
+            logger.warning("Task %s #%s failed (attempt %s); retrying at %s",
+                           item.name, item.pk, item.attempts, item.run_at)
+        else:
+            item.status = Task.FAILED
+            logger.error("Task %s #%s failed permanently after %s attempts",
+                         item.name, item.pk, item.attempts)
+        item.save(update_fields=['status', 'run_at', 'last_error', 'updated_at'])
+        return False
+    item.status = Task.DONE
+    item.save(update_fields=['status', 'updated_at'])
+    return True
+
+
+def run_pending(batch_size=10):
+    """Claim and run one batch; returns how many tasks were attempted."""
+    tasks = claim(batch_size)
+    for item in tasks:
+        execute(item)
+    return len(tasks)
+
+
+def discover():
+    """Import every installed app's ``tasks`` module so its tasks register."""
+    autodiscover_modules('tasks')
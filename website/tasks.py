@@ -0,0 +1,11 @@
+from website.services.tasks import task
+
+
+@task(max_attempts=3)
+def build_image_derivatives(image_id):
+    from website.models import ProductImage
+    from website.services.images import generate_derivatives
+
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is not None:
+        generate_derivatives(image)
@@ -0,0 +1,33 @@
+from django import template
+from django.utils.html import format_html
+
+from website.services.images import srcset
+
+register = template.Library()
+
+DEFAULT_SIZES = "(max-width: 576px) 100vw, (max-width: 992px) 50vw, 25vw"
+
+
+@register.simple_tag
+def product_picture(product, css_class="", sizes=DEFAULT_SIZES):
+    """
+    Render the product's primary image as a <picture> with WebP and JPEG
+    srcsets, or a plain <img> of the original until derivatives exist.
+    """
+    url = product.primary_image_url
+    if not url:
+        return ""
+    variants = product.primary_image_variants
+    if not variants.get("jpg"):
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', url, css_class, product.name)
+
+    jpg_srcset = srcset(variants, "jpg")
+    # Browsers without srcset support get the middle width.
+    fallback = variants["jpg"][len(variants["jpg"]) // 2][1]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy"></picture>',
+        srcset(variants, "webp"), sizes,
+        product.images.model._meta.get_field("image").storage.url(fallback), jpg_srcset, sizes,
+        css_class, product.name,
+    )
@@ -1,3 +1,1620 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.db import OperationalError, connection, connections, transaction
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from website.api.renderers import ORJSONRenderer
+from website.api.serialization.product_serializer import ProductListSerializer, ProductSerializer
+from website.api.views import ProductListCreateView, ProductRetrieveUpdateDeleteView
+from website.context_processors import cart_summary
+from website.db import pool as db_pool
+from website.metrics import registry as metrics_registry
+from website.middleware import QueryBudgetExceeded, query_budget
+from website.models import CartItem, Order, Product, ProductImage, Task
+from website.pagination import decode_cursor, encode_cursor, InvalidCursor
+from website.services import auth_cache
+from website.services import cart as cart_service
+from website.services import cart_store
+from website.services import catalog
+from website.services import checkout as checkout_service
+from website.services import export, product_import
+from website.services.images import generate_derivatives
+from website.services import tasks
+from website.services.search import index as search_index
+from website.services import product_cache
+
+
+def make_products(count, start=1):
+    return Product.objects.bulk_create(
+        Product(id=i, name=f"Product {i}", price=Decimal("10.00") + i, stock=i % 3)
+        for i in range(start, start + count)
+    )
+
+
+# -------------------------
+# Keyset pagination
+# -------------------------
+@override_settings(PRODUCT_PAGE_SIZE=5, PRODUCT_MAX_PAGE_SIZE=10)
+class ProductPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_products(12)
+        cls.user = get_user_model().objects.create_user("shopper", "shopper@example.com", "pass12345")
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(42, reverse=True)), (42, True))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("not-a-cursor")
+
+    def test_json_list_walks_forward_and_back(self):
+        url = reverse("api_product_list")
+        first = self.client.get(url).json()
+        self.assertEqual([p["id"] for p in first["results"]], [1, 2, 3, 4, 5])
+        self.assertIsNone(first["previous"])
+
+        second = self.client.get(first["next"]).json()
+        self.assertEqual([p["id"] for p in second["results"]], [6, 7, 8, 9, 10])
+
+        back = self.client.get(second["previous"]).json()
+        self.assertEqual([p["id"] for p in back["results"]], [1, 2, 3, 4, 5])
+
+        last = self.client.get(second["next"]).json()
+        self.assertEqual([p["id"] for p in last["results"]], [11, 12])
+        self.assertIsNone(last["next"])
+
+    def test_json_list_sparse_fields_and_page_size_cap(self):
+        data = self.client.get(reverse("api_product_list"), {"fields": "id,name,price", "page_size": 50}).json()
+        self.assertEqual(len(data["results"]), 10)
+        self.assertEqual(set(data["results"][0]), {"id", "name", "price"})
+
+    def test_json_list_rejects_bad_input(self):
+        url = reverse("api_product_list")
+        self.assertEqual(self.client.get(url, {"cursor": "garbage"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"fields": "id,secret"}).status_code, 400)
+
+    def test_drf_list_is_paginated(self):
+        factory = APIRequestFactory()
+        request = factory.get("/api/products/", {"fields": "id,name", "page_size": 3})
+        force_authenticate(request, user=self.user)
+        response = ProductListCreateView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["id"] for p in response.data["results"]], [1, 2, 3])
+        self.assertEqual(set(response.data["results"][0]), {"id", "name"})
+        self.assertIsNotNone(response.data["next"])
+
+    def test_html_list_is_paginated(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("product_list"))
+        self.assertEqual(len(response.context["products"]), 5)
+        self.assertTrue(response.context["page"].has_next)
+        response = self.client.get(reverse("product_list"), {"cursor": "garbage"})
+        self.assertEqual(response.context["products"][0].id, 1)
+
+    def test_html_page_links_keep_the_other_parameters(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("product_list"), {"page_size": 3, "cursor": encode_cursor(3)})
+        page = response.context["page"]
+        self.assertContains(response, f'href="?page_size=3&amp;cursor={page.next_cursor}"')
+        self.assertContains(response, f'href="?page_size=3&amp;cursor={page.previous_cursor}"')
+
+
+# -------------------------
+# Product image loading
+# -------------------------
+class ProductImageQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("admin", "admin@example.com", "pass12345")
+
+    def add_catalog(self, count, start):
+        for product in make_products(count, start=start):
+            ProductImage.objects.create(product=product, image=f"product_images/{product.id}-a.jpg")
+            ProductImage.objects.create(product=product, image=f"product_images/{product.id}-b.jpg")
+
+    def test_primary_image_annotation(self):
+        self.add_catalog(2, start=1)
+        product = Product.objects.with_primary_image().get(id=1)
+        self.assertEqual(product.primary_image_url, "/media/product_images/1-a.jpg")
+        self.assertEqual(Product.objects.get(id=1).primary_image_url, "/media/product_images/1-a.jpg")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_listing_query_count_is_independent_of_catalog_size(self):
+        self.client.force_login(self.user)
+        for name in ("home", "product_list", "dashboard"):
+            with self.subTest(view=name):
+                Product.objects.all().delete()
+                self.add_catalog(2, start=1)
+                self.client.get(reverse(name))  # warm the cart summary cache
+                with CaptureQueriesContext(connection) as small:
+                    self.client.get(reverse(name))
+                self.add_catalog(20, start=100)
+                with self.assertNumQueries(len(small)):
+                    response = self.client.get(reverse(name))
+                self.assertContains(response, "/media/product_images/119-a.jpg")
+
+
+# -------------------------
+# Cart mutations
+# -------------------------
+class CartServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "pass12345")
+        cls.product = Product.objects.create(id=1, name="Lamp", price=Decimal("20.00"), stock=3)
+
+    def test_add_increments_up_to_stock(self):
+        for _ in range(3):
+            cart_service.add_item(self.user, self.product)
+        with self.assertRaises(cart_service.OutOfStock):
+            cart_service.add_item(self.user, self.product)
+        item = CartItem.objects.get()
+        self.assertEqual(item.quantity, 3)
+
+    def test_stock_is_checked_against_the_database_not_a_stale_product(self):
+        stale = Product.objects.get(pk=1)
+        stale.stock = 100
+        with self.assertRaises(cart_service.OutOfStock):
+            cart_service.add_item(self.user, stale, 4)
+        cart_service.add_item(self.user, stale, 2)
+        with self.assertRaises(cart_service.OutOfStock):
+            cart_service.add_item(self.user, stale, 2)
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_update_and_remove(self):
+        cart_service.add_item(self.user, self.product)
+        item = CartItem.objects.get()
+        cart_service.update_item(self.user, item.id, 2)
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+        with self.assertRaises(cart_service.OutOfStock):
+            cart_service.update_item(self.user, item.id, 10)
+        other = get_user_model().objects.create_user("other", "other@example.com", "pass12345")
+        with self.assertRaises(CartItem.DoesNotExist):
+            cart_service.update_item(other, item.id, 1)
+        self.assertEqual(cart_service.remove_item(self.user, self.product.id), 1)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_add_to_cart_view(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("add_to_cart", args=[self.product.id]))
+        self.client.get(reverse("add_to_cart", args=[self.product.id]))
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+
+def supports_concurrent_writes():
+    # SQLite's default deferred transactions fail lock upgrades instead of waiting.
+    options = connection.settings_dict.get("OPTIONS", {})
+    return connection.vendor != "sqlite" or options.get("transaction_mode") == "IMMEDIATE"
+
+
+@skipUnless(supports_concurrent_writes(), "database cannot serialize concurrent writers")
+class ConcurrentCartTests(TransactionTestCase):
+    threads = 16
+
+    def run_parallel(self, func):
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                func()
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return errors
+
+    def test_parallel_adds_are_not_lost(self):
+        user = get_user_model().objects.create_user("racer", "racer@example.com", "pass12345")
+        product = Product.objects.create(id=1, name="Mug", price=Decimal("5.00"), stock=100)
+        errors = self.run_parallel(lambda: cart_service.add_item(user, product))
+        self.assertEqual(errors, [])
+        self.assertEqual(CartItem.objects.get().quantity, self.threads)
+
+    def test_parallel_adds_never_exceed_stock(self):
+        user = get_user_model().objects.create_user("racer", "racer@example.com", "pass12345")
+        product = Product.objects.create(id=1, name="Mug", price=Decimal("5.00"), stock=5)
+        errors = self.run_parallel(lambda: cart_service.add_item(user, product))
+        self.assertEqual(CartItem.objects.get().quantity, 5)
+        self.assertEqual(len(errors), self.threads - 5)
+        self.assertTrue(all(isinstance(exc, cart_service.OutOfStock) for exc in errors))
+
+
+class CartSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "pass12345")
+        cls.lamp = Product.objects.create(id=1, name="Lamp", price=Decimal("20.00"), stock=5)
+        cls.mug = Product.objects.create(id=2, name="Mug", price=Decimal("4.50"), stock=5)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def summary(self):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        return cart_summary(request)["cart_summary"]
+
+    def test_summary_is_served_from_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cart_service.add_item(self.user, self.lamp)
+        with self.assertNumQueries(0):
+            summary = self.summary()
+        self.assertEqual(summary["count"], 1)
+        self.assertEqual(summary["total"], Decimal("20.00"))
+
+    def test_cart_views_keep_summary_current(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse("add_to_cart", args=[self.lamp.id]))
+            self.client.get(reverse("add_to_cart", args=[self.mug.id]))
+            self.client.get(reverse("add_to_cart", args=[self.mug.id]))
+        self.assertEqual(self.summary()["count"], 3)
+        self.assertEqual(self.summary()["total"], Decimal("29.00"))
+
+        item = CartItem.objects.get(product=self.mug)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("update_cart", args=[item.id]), {"quantity": 1})
+        self.assertEqual(self.summary()["count"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse("remove_from_cart", args=[self.lamp.id]))
+        summary = self.summary()
+        self.assertEqual(summary["count"], 1)
+        self.assertEqual([line["name"] for line in summary["lines"]], ["Mug"])
+
+    def test_direct_item_writes_invalidate_summary(self):
+        self.assertEqual(self.summary()["count"], 0)
+        cart = cart_service.get_cart(self.user)
+        CartItem.objects.create(cart=cart, product=self.lamp, quantity=2)
+        self.assertEqual(self.summary()["count"], 2)
+
+
+# -------------------------
+# Product read cache
+# -------------------------
+class ProductCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("admin", "admin@example.com", "pass12345")
+        cls.product = Product.objects.create(id=1, name="Lamp", price=Decimal("20.00"), stock=5)
+
+    def setUp(self):
+        cache.clear()
+        product_cache.reset_stats()
+
+    def test_reads_hit_cache_after_first_load(self):
+        url = reverse("api_product_list", args=[self.product.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()["name"], "Lamp")
+        stats = product_cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertGreater(stats["hit_rate"], 0.5)
+
+    def test_missing_product_is_404(self):
+        self.assertEqual(self.client.get(reverse("api_product_list", args=[999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("product_page", args=[999])).status_code, 404)
+
+    def test_writes_invalidate_cached_product(self):
+        product_cache.get_product(self.product.id)
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("edit_product", args=[self.product.id]),
+            {"name": "Desk Lamp", "price": "25.00", "description": "", "stock": 5},
+        )
+        self.assertEqual(product_cache.get_product(self.product.id).name, "Desk Lamp")
+
+        self.client.put(
+            reverse("api_admin_prodcut"), data={"id": self.product.id, "stock": 9},
+            content_type="application/json",
+        )
+        self.assertEqual(product_cache.get_product(self.product.id).stock, 9)
+
+        Product.objects.get(id=self.product.id).delete()
+        with self.assertRaises(Product.DoesNotExist):
+            product_cache.get_product(self.product.id)
+
+    def test_image_changes_invalidate(self):
+        version = product_cache.catalog_version()
+        ProductImage.objects.create(product=self.product, image="product_images/lamp.jpg")
+        self.assertGreater(product_cache.catalog_version(), version)
+
+
+# -------------------------
+# Conditional GET
+# -------------------------
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("admin", "admin@example.com", "pass12345")
+        make_products(3)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_answers_304_until_catalog_changes(self):
+        url = reverse("api_product_list")
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.assertNotEqual(self.client.get(url, {"fields": "id"})["ETag"], etag)
+        product = Product.objects.get(id=2)
+        product.stock = 50
+        product.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_answers_304_from_cache(self):
+        url = reverse("api_product_list", args=[1])
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_drf_views_are_conditional(self):
+        factory = APIRequestFactory()
+
+        def get(view, path, **kwargs):
+            request = factory.get(path, **kwargs)
+            force_authenticate(request, user=self.user)
+            return view(request, **({"pk": 1} if "pk" in path else {}))
+
+        detail = ProductRetrieveUpdateDeleteView.as_view()
+        etag = get(detail, "/api/products/pk/")["ETag"]
+        self.assertEqual(get(detail, "/api/products/pk/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        listing = ProductListCreateView.as_view()
+        etag = get(listing, "/api/products/")["ETag"]
+        self.assertEqual(get(listing, "/api/products/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+# -------------------------
+# Catalog export
+# -------------------------
+class ProductExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_products(7)
+
+    def test_batches_are_bounded(self):
+        batches = list(export.iter_batches(chunk_size=3))
+        self.assertEqual([len(rows) for rows in batches], [3, 3, 1])
+
+    def test_streams_json_array(self):
+        response = self.client.get(reverse("api_product_export"))
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([row["id"] for row in data], list(range(1, 8)))
+        self.assertEqual(data[0]["price"], "11.00")
+
+    def test_streams_gzipped_ndjson(self):
+        response = self.client.get(
+            reverse("api_product_export"), {"format": "ndjson"}, HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(json.loads(lines[-1])["id"], 7)
+
+    def test_gzip_honours_q_values(self):
+        for header, gzipped in [
+            ("gzip;q=0", False), ("br, gzip;q=0.5", True), ("*;q=0.1", True),
+            ("*, gzip;q=0", False), ("GZIP ; q=0.000", False), ("identity", False),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(export.accepts_gzip(header), gzipped)
+        response = self.client.get(reverse("api_product_export"), HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_rejects_unknown_format(self):
+        self.assertEqual(self.client.get(reverse("api_product_export"), {"format": "xml"}).status_code, 400)
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "products.json.gz")
+            call_command("export_products", "--format", "json", "--gzip", "--chunk-size", "2", "--output", path)
+            with gzip.open(path) as stream:
+                self.assertEqual(len(json.load(stream)), 7)
+
+
+# -------------------------
+# Bulk import
+# -------------------------
+class ProductImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser("root", "root@example.com", "pass12345")
+        Product.objects.create(id=1, name="Lamp", price=Decimal("20.00"), stock=5)
+
+    def test_creates_updates_and_reports_errors(self):
+        rows = [
+            {"id": 1, "name": "Desk Lamp", "price": "22.50", "stock": 4},
+            {"name": "Mug", "price": "4.00"},
+            {"name": "", "price": "oops"},
+            {"id": 50, "name": "Chair", "price": "80.00", "stock": 2},
+        ]
+        report = product_import.import_products(rows, batch_size=2)
+        self.assertEqual((report["created"], report["updated"]), (2, 1))
+        self.assertEqual([error["row"] for error in report["errors"]], [2])
+        self.assertEqual(Product.objects.get(id=1).name, "Desk Lamp")
+        self.assertEqual(Product.objects.get(id=50).stock, 2)
+        self.assertTrue(Product.objects.filter(name="Mug").exists())
+
+    def test_update_leaves_omitted_columns_alone(self):
+        Product.objects.create(id=2, name="Vase", price=Decimal("12.00"), description="Glass", stock=7)
+        rows = [{"id": 2, "name": "Tall Vase", "price": "14.00"}, {"id": 1, "name": "Lamp", "price": "20.00", "stock": 1}]
+        report = product_import.import_products(rows)
+        self.assertEqual(report["updated"], 2)
+        vase = Product.objects.get(id=2)
+        self.assertEqual((vase.name, vase.price, vase.description, vase.stock), ("Tall Vase", Decimal("14.00"), "Glass", 7))
+        self.assertEqual(Product.objects.get(id=1).stock, 1)
+
+    def test_command_reads_csv_and_ndjson(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "products.csv")
+            with open(csv_path, "w") as stream:
+                stream.write("id,name,price,description,stock\n1,Lamp v2,21.00,,3\n,Pen,1.50,Blue,\n")
+            ndjson_path = os.path.join(tmp, "products.ndjson")
+            with open(ndjson_path, "w") as stream:
+                stream.write('{"name": "Bag", "price": "30.00"}\nnot json\n')
+            call_command("import_products", csv_path, "--batch-size", "1", stdout=StringIO())
+            call_command("import_products", ndjson_path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Product.objects.get(id=1).name, "Lamp v2")
+        self.assertEqual(Product.objects.get(name="Pen").stock, 0)
+        self.assertTrue(Product.objects.filter(name="Bag").exists())
+
+    def test_bulk_endpoint(self):
+        client = APIClient()
+        url = reverse("api_product_bulk")
+        payload = [{"name": "Mug", "price": "4.00"}, {"price": "1.00"}]
+        self.assertEqual(client.post(url, payload, format="json").status_code, 401)
+        client.force_authenticate(user=self.admin)
+        report = client.post(url, payload, format="json").json()
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(report["errors"][0]["row"], 1)
+        self.assertIn("name", report["errors"][0]["errors"])
+        self.assertEqual(client.post(url, {"name": "x"}, format="json").status_code, 400)
+
+
+# -------------------------
+# Rendering fast path
+# -------------------------
+class ProductRenderingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_products(3)
+
+    def test_list_serializer_matches_model_serializer(self):
+        fields = ProductSerializer.Meta.fields
+        slow = ProductSerializer(Product.objects.order_by("id"), many=True).data
+        fast = ProductListSerializer(Product.objects.order_by("id").values(*fields), fields).data
+        self.assertEqual(json.loads(ORJSONRenderer().render(fast)), json.loads(ORJSONRenderer().render(slow)))
+
+    def test_renderer_encodes_decimals_as_strings(self):
+        self.assertEqual(json.loads(ORJSONRenderer().render({"price": Decimal("9.50")})), {"price": "9.50"})
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+
+# -------------------------
+# Product search
+# -------------------------
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.create(id=1, name="Red Desk Lamp", price=Decimal("20.00"), description="LED, warm light")
+        Product.objects.create(id=2, name="Desk", price=Decimal("90.00"), description="Oak desk with lamp hook")
+        Product.objects.create(id=3, name="Coffee Mug", price=Decimal("4.00"), description="Ceramic")
+
+    def setUp(self):
+        search_index.invalidate()
+        search_index.warm(background=False)
+
+    def tearDown(self):
+        search_index.invalidate()
+
+    def test_ranks_name_matches_first_and_requires_every_term(self):
+        self.assertEqual(search_index.search("lamp"), [1, 2])
+        self.assertEqual(search_index.search("desk lamp"), [1, 2])
+        self.assertEqual(search_index.search("lamp ceramic"), [])
+
+    def test_prefix_matches(self):
+        self.assertEqual(search_index.search("cof"), [3])
+        self.assertEqual(search_index.search("de"), [2, 1])
+
+    def test_tracks_saves_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(id=4, name="Travel Mug", price=Decimal("8.00"))
+        self.assertEqual(search_index.search("mug"), [3, 4])
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(id=3).delete()
+        self.assertEqual(search_index.search("mug"), [4])
+        self.assertEqual(search_index.search("ceramic"), [])
+
+    def test_endpoint_uses_index_and_falls_back_when_cold(self):
+        url = reverse("api_product_search")
+        data = self.client.get(url, {"q": "lamp"}).json()
+        self.assertEqual(data["source"], "index")
+        self.assertEqual([row["id"] for row in data["results"]], [1, 2])
+
+        search_index.invalidate()
+        with mock.patch.object(search_index, "warm") as warm:
+            data = self.client.get(url, {"q": "lamp"}).json()
+        warm.assert_called_once()
+        self.assertEqual(data["source"], "database")
+        self.assertEqual([row["id"] for row in data["results"]], [1, 2])
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_writes_from_other_processes_retire_the_index(self):
+        from website.services import search
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(id=4, name="Lamp Shade", price=Decimal("8.00"))
+        self.assertEqual(search.search("shade"), ([4], "index"))  # our own write keeps it current
+
+        # Another worker saved a product: its receiver bumped the shared version only.
+        cache.incr(search.VERSION_KEY)
+        with mock.patch.object(search_index, "warm") as warm:
+            self.assertEqual(search.search("shade"), ([4], "database"))
+        warm.assert_called_once()
+        self.assertFalse(search_index.is_warm)
+
+
+# -------------------------
+# Image derivatives
+# -------------------------
+def jpeg_bytes(width, height):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), (200, 60, 30)).save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name, PRODUCT_IMAGE_WIDTHS=(160, 320, 2000))
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.product = Product.objects.create(name="Lamp", price=Decimal("20.00"))
+
+    def upload(self, width=800, height=1200):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(
+                product=self.product, image=SimpleUploadedFile("lamp.jpg", jpeg_bytes(width, height)),
+            )
+        self.assertEqual(image.variants, {})
+        call_command("run_tasks", "--once", stdout=StringIO())
+        image.refresh_from_db()
+        return image
+
+    def test_upload_builds_hashed_webp_and_jpeg_variants(self):
+        image = self.upload()
+        self.assertEqual([width for width, _ in image.variants["webp"]], [160, 320, 800])
+        for width, name in image.variants["webp"] + image.variants["jpg"]:
+            self.assertRegex(name, rf"^product_images/lamp\.[0-9a-f]{{12}}\.{width}w\.(webp|jpg)$")
+            self.assertTrue(os.path.exists(os.path.join(self.media.name, name)))
+        self.assertEqual(generate_derivatives(image), image.variants)
+
+    def test_template_tag_emits_srcset(self):
+        self.upload()
+        product = Product.objects.with_primary_image().get()
+        html = Template("{% load product_images %}{% product_picture product 'card-img-top' %}").render(
+            Context({"product": product})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(".160w.webp 160w", html)
+        self.assertIn(".320w.jpg 320w", html)
+
+    def test_template_tag_falls_back_to_original(self):
+        ProductImage.objects.create(product=self.product, image="product_images/missing.jpg")
+        product = Product.objects.with_primary_image().get()
+        html = Template("{% load product_images %}{% product_picture product %}").render(Context({"product": product}))
+        self.assertIn('src="/media/product_images/missing.jpg"', html)
+
+
+# -------------------------
+# Background tasks
+# -------------------------
+calls = []
+
+
+@tasks.task(max_attempts=2)
+def flaky_task(value):
+    calls.append(value)
+    if value == "fail":
+        raise RuntimeError("boom")
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_signup_creates_the_token_without_the_queue(self):
+        from rest_framework.authtoken.models import Token
+
+        self.client.post(reverse("signup"), {
+            "username": "newbie", "email": "newbie@example.com",
+            "password1": "Sturdy-pass-99", "password2": "Sturdy-pass-99",
+        })
+        self.assertTrue(Token.objects.filter(user__username="newbie").exists())
+        self.assertFalse(Task.objects.exists())
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        flaky_task.delay("fail")
+        self.assertEqual(tasks.run_pending(), 1)
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts), (Task.QUEUED, 1))
+        self.assertIn("RuntimeError: boom", queued.last_error)
+        self.assertEqual(tasks.run_pending(), 0)  # not due until the backoff expires
+
+        Task.objects.update(run_at=queued.created_at)
+        tasks.run_pending()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Task.FAILED, 2))
+        self.assertEqual(calls, ["fail", "fail"])
+
+    def test_backoff_grows_and_caps(self):
+        with self.settings(TASK_RETRY_BACKOFF=5, TASK_RETRY_BACKOFF_MAX=30):
+            self.assertEqual([tasks.backoff(n) for n in range(1, 6)], [5, 10, 20, 30, 30])
+
+    def test_eager_mode_runs_on_commit(self):
+        with self.settings(TASKS_EAGER=True), self.captureOnCommitCallbacks(execute=True):
+            flaky_task.delay("now")
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, ["now"])
+        self.assertFalse(Task.objects.exists())
+
+
+# -------------------------
+# Request metrics
+# -------------------------
+@override_settings(METRICS_TOKEN="scrape-token")
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_products(3)
+
+    def setUp(self):
+        cache.clear()
+        metrics_registry.reset()
+
+    def scrape(self, token="scrape-token"):
+        return self.client.get(reverse("metrics"), headers={"Authorization": f"Bearer {token}"})
+
+    def test_metrics_exposes_per_view_histograms(self):
+        self.client.get(reverse("api_product_list"))
+        body = self.scrape().content.decode()
+        self.assertIn('http_requests_total{method="GET",status="200",view="api_product_list"} 1', body)
+        self.assertIn('http_request_db_queries_bucket{view="api_product_list",le="+Inf"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{view="api_product_list"} 1', body)
+        self.assertIn('http_response_size_bytes_count{view="api_product_list"} 1', body)
+        self.assertIn("# TYPE product_cache_hits_total counter", body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        from website.metrics import Histogram
+
+        histogram = Histogram("queries", "Queries.", (1, 5, 10))
+        for value in (0, 3, 5, 40):
+            histogram.observe(value, view="home")
+        samples = {(name, dict(labels).get("le")): value for name, labels, value in histogram.samples()}
+        self.assertEqual(
+            [samples[("queries_bucket", le)] for le in ("1", "5", "10", "+Inf")], [1, 3, 3, 4],
+        )
+        self.assertEqual((samples[("queries_sum", None)], samples[("queries_count", None)]), (48, 4))
+
+    def test_metrics_is_restricted(self):
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.7")
+        self.assertEqual(response.status_code, 403)
+        # A tunnel or proxy on the same host connects from loopback.
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1").status_code, 403)
+        self.assertEqual(self.scrape("nope").status_code, 403)
+        self.assertEqual(self.scrape().status_code, 200)
+        staff = get_user_model().objects.create_user("ops", "ops@example.com", "pass12345", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.7")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+    def test_budget_overrun_raises_or_logs(self):
+        with self.settings(QUERY_BUDGET=0, QUERY_BUDGET_ACTION="raise"):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse("api_product_list"))
+        with self.settings(QUERY_BUDGET=0, QUERY_BUDGET_ACTION="log"):
+            with self.assertLogs("website.middleware", "WARNING") as logs:
+                response = self.client.get(reverse("api_product_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("api_product_list issued", logs.output[0])
+        body = self.scrape().content.decode()
+        self.assertIn('http_request_query_budget_exceeded_total{view="api_product_list"} 2', body)
+
+    def test_view_budget_overrides_setting(self):
+        from django.urls import resolve
+
+        view = resolve(reverse("api_product_list")).func
+        with mock.patch.object(view, "query_budget", 0, create=True), \
+                self.settings(QUERY_BUDGET=100, QUERY_BUDGET_ACTION="raise"):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse("api_product_list"))
+        self.assertIs(query_budget(5)(flaky_task), flaky_task)
+        self.assertEqual(flaky_task.query_budget, 5)
+        del flaky_task.query_budget
+
+
+# -------------------------
+# Benchmark harness
+# -------------------------
+class BenchmarkHarnessTests(TestCase):
+    def test_seed_storefront_and_micro_benchmarks_run(self):
+        from benchmarks import bench_views, data
+
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            data.seed_storefront(products=30, images=3, users=4, cart_lines=2)
+            self.assertEqual(Product.objects.count(), 30)
+            self.assertTrue(all(image.variants.get("webp") for image in ProductImage.objects.all()))
+            self.assertEqual(CartItem.objects.filter(cart__user__username="bench-user-3").count(), 2)
+            self.assertTrue(self.client.login(username="bench-user-0", password=data.PASSWORD))
+
+            for name, bench in bench_views.CASES.items():
+                benchmark = bench_views.Benchmark(rounds=3, warmup=1)
+                bench(benchmark)
+                self.assertEqual(benchmark.result["count"], 3, name)
+
+
+# -------------------------
+# Dashboard statistics
+# -------------------------
+class DashboardStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("boss", "boss@example.com", "pass12345", is_staff=True)
+        make_products(9)  # stock cycles 1, 2, 0; price 11..19
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stats_are_sql_aggregates(self):
+        from website.services import dashboard
+
+        cart_service.add_item(self.user, Product.objects.get(id=1), 1)
+        cart_service.add_item(self.user, Product.objects.get(id=4), 1)
+        with self.assertNumQueries(3):
+            stats = dashboard.compute_stats()
+        inventory = sum(Decimal("10.00") + i for i in range(1, 10) for _ in range(i % 3))
+        self.assertEqual(stats["inventory_value"], inventory)
+        self.assertEqual((stats["products"], stats["users"]), (9, 1))
+        self.assertEqual((stats["low_stock"], stats["out_of_stock"]), (6, 3))
+        self.assertEqual((stats["active_carts"], stats["cart_items"]), (1, 2))
+        self.assertEqual(stats["cart_value"], Decimal("25.00"))
+
+    def test_stats_are_cached_for_a_short_ttl(self):
+        from website.services import dashboard
+
+        first = dashboard.get_stats()
+        make_products(2, start=50)
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard.get_stats(), first)
+        cache.delete(dashboard.STATS_KEY)  # as when DASHBOARD_STATS_TIMEOUT runs out
+        self.assertEqual(dashboard.get_stats()["products"], 11)
+
+    def test_dashboard_renders_bounded_lists(self):
+        make_products(30, start=100)
+        self.client.force_login(self.user)
+        with self.settings(DASHBOARD_TOP_N=4):
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(len(response.context["recent_products"]), 4)
+        self.assertEqual([p.stock for p in response.context["low_stock_products"]], [0, 0, 0, 0])
+        self.assertEqual(response.context["stats"]["products"], 39)
+        self.assertContains(response, "Newest Users")
+
+
+# -------------------------
+# Checkout and stock reservation
+# -------------------------
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("payer", "payer@example.com", "pass12345")
+        cls.lamp = Product.objects.create(id=1, name="Lamp", price=Decimal("20.00"), stock=3)
+        cls.mug = Product.objects.create(id=2, name="Mug", price=Decimal("4.50"), stock=10)
+
+    def fill_cart(self):
+        cart_service.add_item(self.user, self.lamp, 2)
+        cart_service.add_item(self.user, self.mug, 3)
+
+    def test_checkout_reserves_stock_and_empties_cart(self):
+        self.fill_cart()
+        order = checkout_service.checkout(self.user)
+        self.assertEqual((order.status, order.total), (Order.PENDING, Decimal("53.50")))
+        self.assertEqual(
+            list(order.items.order_by("product_id").values_list("name", "quantity")), [("Lamp", 2), ("Mug", 3)],
+        )
+        self.assertEqual(
+            list(Product.objects.order_by("id").values_list("stock", flat=True)), [1, 7],
+        )
+        self.assertFalse(CartItem.objects.exists())
+        with self.assertRaises(checkout_service.EmptyCart):
+            checkout_service.checkout(self.user)
+
+    def test_insufficient_stock_changes_nothing(self):
+        self.fill_cart()
+        Product.objects.filter(id=1).update(stock=1)
+        with self.assertRaises(checkout_service.InsufficientStock) as raised:
+            checkout_service.checkout(self.user)
+        self.assertEqual([p.name for p in raised.exception.products], ["Lamp"])
+        self.assertEqual(list(Product.objects.order_by("id").values_list("stock", flat=True)), [1, 10])
+        self.assertEqual(CartItem.objects.count(), 2)
+        self.assertFalse(Order.objects.exists())
+
+    def test_expired_reservations_return_stock(self):
+        self.fill_cart()
+        order = checkout_service.checkout(self.user)
+        self.assertEqual(checkout_service.expire_reservations(), 0)
+        Order.objects.filter(pk=order.pk).update(reserved_until=order.created_at)
+        call_command("expire_reservations", stdout=StringIO())
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.EXPIRED)
+        self.assertEqual(list(Product.objects.order_by("id").values_list("stock", flat=True)), [3, 10])
+        with self.assertRaises(checkout_service.OrderNotPending):
+            checkout_service.mark_paid(order.pk)
+
+    def test_paying_late_releases_the_reservation(self):
+        self.fill_cart()
+        order = checkout_service.checkout(self.user)
+        Order.objects.filter(pk=order.pk).update(reserved_until=order.created_at)
+        with self.assertRaises(checkout_service.OrderNotPending):
+            checkout_service.mark_paid(order.pk)
+        self.assertEqual(Order.objects.get().status, Order.EXPIRED)
+        self.assertEqual(Product.objects.get(id=1).stock, 3)
+
+    def test_paid_orders_keep_stock_and_cancel_restocks(self):
+        self.fill_cart()
+        paid = checkout_service.mark_paid(checkout_service.checkout(self.user).pk)
+        self.assertEqual(paid.status, Order.PAID)
+        cart_service.add_item(self.user, self.mug, 1)
+        cancelled = checkout_service.cancel(checkout_service.checkout(self.user).pk)
+        self.assertEqual(cancelled.status, Order.CANCELLED)
+        self.assertEqual(list(Product.objects.order_by("id").values_list("stock", flat=True)), [1, 7])
+
+    def test_stock_changes_only_retire_the_products_involved(self):
+        self.fill_cart()
+        Product.objects.create(id=3, name="Rug", price=Decimal("60.00"), stock=1)
+        for pk in (1, 2, 3):
+            product_cache.get_product(pk)
+        version = product_cache.catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout_service.checkout(self.user)
+        self.assertEqual(product_cache.catalog_version(), version)
+        connection.queries_log.clear()
+        with self.assertNumQueries(0):
+            product_cache.get_product(3)
+        self.assertEqual(product_cache.get_product(1).stock, 1)
+
+    def test_checkout_view(self):
+        self.fill_cart()
+        self.client.force_login(self.user)
+        response = self.client.post(reverse("checkout"))
+        self.assertRedirects(response, reverse("cart_view"))
+        self.assertEqual(Order.objects.get().user, self.user)
+        self.assertFalse(CartItem.objects.exists())
+
+
+@skipUnless(supports_concurrent_writes(), "database cannot serialize concurrent writers")
+class ConcurrentCheckoutTests(TransactionTestCase):
+    threads = 16
+    run_parallel = ConcurrentCartTests.run_parallel
+
+    def test_parallel_checkouts_never_oversell(self):
+        hot = Product.objects.create(id=1, name="Hot", price=Decimal("9.00"), stock=5)
+        cold = Product.objects.create(id=2, name="Cold", price=Decimal("1.00"), stock=1000)
+        users = []
+        for number in range(self.threads):
+            user = get_user_model().objects.create_user(f"buyer{number}", f"buyer{number}@example.com", "pw")
+            # Alternate the order lines were added in; locking order must not depend on it.
+            for product in ((hot, cold) if number % 2 else (cold, hot)):
+                cart_service.add_item(user, product)
+            users.append(user)
+        queue = list(users)
+        lock = threading.Lock()
+
+        def buy():
+            with lock:
+                user = queue.pop()
+            checkout_service.checkout(user)
+
+        errors = self.run_parallel(buy)
+        self.assertEqual(Product.objects.get(id=1).stock, 0)
+        self.assertEqual(Product.objects.get(id=2).stock, 1000 - 5)
+        self.assertEqual(Order.objects.count(), 5)
+        self.assertEqual(len(errors), self.threads - 5)
+        self.assertTrue(all(isinstance(exc, checkout_service.InsufficientStock) for exc in errors))
+
+
+# -------------------------
+# Async views
+# -------------------------
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("asyncer", "asyncer@example.com", "pass12345")
+        make_products(30)
+
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    def as_user(self, request, user):
+        async def auser():
+            return user
+
+        request.user, request.auser = user, auser
+        return request
+
+    async def test_product_list_matches_sync_view(self):
+        from website.views import api_product_list, api_product_list_async
+
+        path = "/api/products/?page_size=5&fields=id,name"
+        response = await api_product_list_async(self.factory.get(path))
+        expected = await sync_to_async(api_product_list)(RequestFactory().get(path))
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+        self.assertEqual(response["ETag"], expected["ETag"])
+
+        cursor = json.loads(response.content)["next"].split("cursor=")[1]
+        second = await api_product_list_async(self.factory.get(f"{path}&cursor={cursor}"))
+        self.assertEqual([row["id"] for row in json.loads(second.content)["results"]], [6, 7, 8, 9, 10])
+
+    async def test_product_detail_conditional_and_missing(self):
+        from website.views import api_product_list_async
+
+        response = await api_product_list_async(self.factory.get("/api/products/3"), id=3)
+        self.assertEqual(json.loads(response.content)["name"], "Product 3")
+        cached = await api_product_list_async(
+            self.factory.get("/api/products/3", headers={"If-None-Match": response["ETag"]}), id=3,
+        )
+        self.assertEqual(cached.status_code, 304)
+        with self.assertRaises(Http404):
+            await api_product_list_async(self.factory.get("/api/products/999"), id=999)
+
+    def bearer(self, path):
+        from website.api.authentication import TokenObtainPairSerializer
+
+        access = TokenObtainPairSerializer.get_token(self.user).access_token
+        return self.factory.get(path, headers={"Authorization": f"Bearer {access}"})
+
+    async def test_drf_detail_counterpart(self):
+        from website.api.views import product_detail_async
+
+        response = await product_detail_async(self.bearer("/api/products/2/"), pk=2)
+        self.assertEqual(json.loads(response.content), ProductSerializer(await Product.objects.aget(pk=2)).data)
+        missing = await product_detail_async(self.bearer("/api/products/99/"), pk=99)
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_drf_detail_counterpart_accepts_only_api_credentials(self):
+        from website.api.views import product_detail_async
+
+        # Like the DRF view, a session alone is not enough.
+        session = self.as_user(self.factory.get("/api/products/2/"), self.user)
+        self.assertEqual((await product_detail_async(session, pk=2)).status_code, 401)
+        forged = self.factory.get("/api/products/2/", headers={"Authorization": "Bearer not-a-jwt"})
+        self.assertEqual((await product_detail_async(forged, pk=2)).status_code, 401)
+
+    async def test_cart_view_renders_without_sync_queries(self):
+        from website.views import cart_view_async
+
+        product = await Product.objects.aget(pk=2)  # stock 2
+        await sync_to_async(cart_service.add_item)(self.user, product, 2)
+        response = await cart_view_async(self.as_user(self.factory.get("/cart/"), self.user))
+        self.assertContains(response, "Product 2")
+        self.assertContains(response, '<span class="badge bg-light text-dark">2</span>')
+
+    async def test_metrics_middleware_counts_queries_in_async_mode(self):
+        from website.middleware import RequestMetricsMiddleware
+
+        async def view(request):
+            return HttpResponse(str(await Product.objects.acount()))
+
+        middleware = RequestMetricsMiddleware(view)
+        metrics_registry.reset()
+        response = await middleware(self.factory.get("/anything"))
+        self.assertEqual(response.content, b"30")
+        self.assertIn('http_request_db_queries_sum{view="unresolved"} 1', metrics_registry.render())
+
+
+# -------------------------
+# Database connection pool
+# -------------------------
+class ConnectionPoolTests(TestCase):
+    def make_pool(self, **options):
+        closed = []
+        pool = db_pool.ConnectionPool(close=closed.append, **options)
+        return pool, closed
+
+    def test_reuses_released_connections_up_to_max_size(self):
+        pool, _ = self.make_pool(max_size=2, timeout=0.05)
+        first, second = pool.acquire(object), pool.acquire(object)
+        with self.assertRaises(OperationalError):
+            pool.acquire(object)
+        pool.release(first)
+        self.assertIs(pool.acquire(object), first)
+        self.assertEqual((pool.size, pool.opened, pool.timeouts), (2, 2, 1))
+
+    def test_replaces_unhealthy_expired_and_discarded_connections(self):
+        pool, closed = self.make_pool(check=lambda raw: raw != "broken", max_lifetime=None)
+        pool.release(pool.acquire(lambda: "broken"))
+        self.assertEqual(pool.acquire(lambda: "fresh"), "fresh")
+        self.assertEqual(closed, ["broken"])
+        pool.release("fresh", discard=True)
+        self.assertEqual((pool.size, closed), (0, ["broken", "fresh"]))
+
+        expiring, closed = self.make_pool(max_lifetime=0)
+        expiring.release(expiring.acquire(lambda: "old"))
+        self.assertEqual(expiring.acquire(lambda: "new"), "new")
+        self.assertEqual(closed, ["old"])
+
+    def pooled_wrapper(self, path, **overrides):
+        from website.db.backends.sqlite3.base import DatabaseWrapper
+
+        settings_dict = {**connection.settings_dict, "ENGINE": "website.db.backends.sqlite3", "NAME": path,
+                         "CONN_MAX_AGE": 0, "POOL": {"max_size": 2}, **overrides}
+        return DatabaseWrapper(settings_dict, alias="pooled")
+
+    def test_sqlite_backend_shares_connections_across_threads(self):
+        path = os.path.join(tempfile.mkdtemp(), "pooled.sqlite3")
+        self.addCleanup(db_pool.close_pools)
+        raws = []
+
+        def request(autocommit=True):
+            wrapper = self.pooled_wrapper(path)
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            raws.append(wrapper.connection)
+            wrapper.set_autocommit(autocommit)
+            wrapper.close()
+
+        for autocommit in (True, True, False, True):
+            thread = threading.Thread(target=request, args=(autocommit,))
+            thread.start()
+            thread.join()
+        # The third request left autocommit off, so its connection was not shared again.
+        self.assertIs(raws[0], raws[1])
+        self.assertIs(raws[1], raws[2])
+        self.assertIsNot(raws[2], raws[3])
+        self.assertEqual(db_pool.stats(), {"connections": 1, "idle": 1, "opened": 2, "timeouts": 0})
+
+    def test_persistent_connections_are_rejected_with_a_pool(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.pooled_wrapper(":memory:", CONN_MAX_AGE=60)
+
+
+# -------------------------
+# Schema indexes
+# -------------------------
+class IndexUsageTests(TestCase):
+    """The hot lookups must be answered from an index, whatever the planner's table sizes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_products(200)
+        cls.user = get_user_model().objects.create_user("indexed", "indexed@example.com", "pass12345")
+        cart_service.add_item(cls.user, Product.objects.get(pk=2), 1)
+
+    def assertUsesIndex(self, queryset, *names):
+        plan = queryset.explain()
+        self.assertTrue(any(name in plan for name in names), f"none of {names} in plan:\n{plan}")
+
+    def test_listing_sorts_and_stock_filters(self):
+        from website.services import dashboard
+
+        self.assertUsesIndex(Product.objects.order_by("price", "id")[:24], "product_price_id")
+        self.assertUsesIndex(Product.objects.filter(stock__gt=0).order_by("price", "id")[:24], "product_price_id")
+        self.assertUsesIndex(Product.objects.order_by("name", "id")[:24], "product_name_id")
+        self.assertUsesIndex(dashboard.low_stock_products(), "product_stock_id")
+
+    def test_cart_line_lookup_uses_the_unique_index(self):
+        lines = CartItem.objects.filter(cart__user=self.user, product_id=2)
+        # SQLite builds unique constraints as anonymous automatic indexes.
+        self.assertUsesIndex(lines, "unique_cart_product", "sqlite_autoindex_website_cartitem")
+
+
+# -------------------------
+# Read replicas
+# -------------------------
+class ReplicaRouterTests(TransactionTestCase):
+    """``default`` is the primary; a second SQLite file plays the replica."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Registered before the test case checks its databases; the test
+        # runner never sees the alias, so no test database is made for it.
+        path = os.path.join(tempfile.mkdtemp(), "replica.sqlite3")
+        connections.settings["replica"] = connections.configure_settings({
+            "default": connections.settings["default"],
+            "replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": path},
+        })["replica"]
+        cls.databases = {"default", "replica"}
+        super().setUpClass()
+        call_command("migrate", database="replica", verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+
+    def setUp(self):
+        cache.clear()
+        make_products(3)
+        Product.objects.using("replica").bulk_create(
+            Product(id=i, name=f"Replica {i}", price=Decimal("1.00"), stock=1) for i in range(1, 4)
+        )
+        replicas = override_settings(REPLICA_DATABASES=["replica"])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+
+    def serve(self, view, method="get", **cookies):
+        from website.middleware import ReplicaPinningMiddleware
+
+        request = getattr(RequestFactory(), method)("/")
+        request.COOKIES.update(cookies)
+        return ReplicaPinningMiddleware(view)(request)
+
+    def test_catalog_reads_in_requests_go_to_the_replica(self):
+        self.assertEqual(Product.objects.get(pk=1).name, "Product 1")
+        listing = self.client.get(reverse("api_product_list"), {"fields": "name"}).json()
+        self.assertEqual([row["name"] for row in listing["results"]], ["Replica 1", "Replica 2", "Replica 3"])
+        # Cache fills read the primary so a lagging replica is never cached.
+        self.assertContains(self.client.get(reverse("product_page", args=[2])), "Product 2")
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        def read(request):
+            return HttpResponse(Product.objects.get(pk=1).name)
+
+        def write_then_read(request):
+            Product.objects.filter(pk=3).update(stock=9)
+            return read(request)
+
+        def read_in_transaction(request):
+            with transaction.atomic():
+                return read(request)
+
+        self.assertEqual(self.serve(read).content, b"Replica 1")
+        self.assertNotIn("db_pin", self.serve(read).cookies)
+        wrote = self.serve(write_then_read)
+        self.assertEqual(wrote.content, b"Product 1")
+        self.assertEqual(wrote.cookies["db_pin"]["max-age"], 5)
+        self.assertEqual(self.serve(read, db_pin="1").content, b"Product 1")
+        self.assertEqual(self.serve(read, method="post").content, b"Product 1")
+        self.assertEqual(self.serve(read_in_transaction).content, b"Product 1")
+
+    def test_connection_setup_statements_do_not_pin(self):
+        from website.db.routers import _watch
+
+        def fresh_connection(request):
+            connection.close()
+            with transaction.atomic():  # BEGIN on the new connection
+                Product.objects.get(pk=2)
+            # What MySQL runs on connect; it never reaches SQLite.
+            _watch(lambda *args: None, "SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED", None, False,
+                   {"connection": connection})
+            return HttpResponse(Product.objects.get(pk=1).name)
+
+        response = self.serve(fresh_connection)
+        self.assertEqual(response.content, b"Replica 1")
+        self.assertNotIn("db_pin", response.cookies)
+
+    def test_replica_selection(self):
+        from website.db.routers import EXPLORE_EVERY, _Selector
+
+        selector = _Selector()
+        self.assertEqual([selector.choose(["a", "b"], "round_robin") for _ in range(4)], ["a", "b", "a", "b"])
+
+        selector = _Selector()
+        selector.observe("a", 0.010)
+        selector.observe("b", 0.002)
+        choices = [selector.choose(["a", "b"], "least_latency") for _ in range(EXPLORE_EVERY * 2)]
+        self.assertEqual(choices.count("a"), 1)  # one exploring turn re-measures the slow replica
+        selector.observe("b", 1.0)
+        self.assertEqual([selector.choose(["a", "b"], "least_latency") for _ in range(2)], ["a", "a"])
+
+
+# -------------------------
+# Listing filters, sorting and facets
+# -------------------------
+@override_settings(PRODUCT_PRICE_BUCKETS=(15, 20))
+class CatalogFilterTests(TestCase):
+    """Product i costs 10 + i and has i % 3 in stock."""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_products(12)
+        cls.user = get_user_model().objects.create_user("filterer", "filterer@example.com", "pass12345")
+
+    def setUp(self):
+        cache.clear()
+
+    def drf_listing(self, **params):
+        request = APIRequestFactory().get("/api/products/", params)
+        force_authenticate(request, user=self.user)
+        return ProductListCreateView.as_view()(request)
+
+    def listing(self, **params):
+        response = self.client.get(reverse("api_product_list"), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_price_and_stock_filters_with_ordering(self):
+        data = self.listing(min_price="12", max_price="18", in_stock="1", ordering="-price", fields="id,price")
+        self.assertEqual([row["id"] for row in data["results"]], [8, 7, 5, 4, 2])
+        self.assertEqual(set(data["results"][0]), {"id", "price"})
+        out_of_stock = self.listing(in_stock="false", fields="id")
+        self.assertEqual([row["id"] for row in out_of_stock["results"]], [3, 6, 9, 12])
+
+    def test_keyset_pages_follow_the_ordering(self):
+        expected = sorted(range(1, 13), key=lambda i: f"Product {i}")
+        seen, params = [], {"ordering": "name", "page_size": 5, "fields": "id"}
+        data = self.listing(**params)
+        while True:
+            seen += [row["id"] for row in data["results"]]
+            if not data["next"]:
+                break
+            data = self.listing(**params, cursor=data["next"].split("cursor=")[1])
+        self.assertEqual(seen, expected)
+        previous = self.listing(**params, cursor=data["previous"].split("cursor=")[1])
+        self.assertEqual([row["id"] for row in previous["results"]], expected[5:10])
+        self.assertEqual(self.client.get(reverse("api_product_list"), {
+            "ordering": "price", "cursor": encode_cursor(3),
+        }).status_code, 400)
+
+    def test_tampered_cursors_are_rejected(self):
+        url = reverse("api_product_list")
+        for ordering, cursor in [
+            ("price", encode_cursor(3, value="abc", field="price")),
+            ("price", encode_cursor(3, value={"x": 1}, field="price")),
+            ("-price", encode_cursor(3, value="12.00", field="name")),
+            ("id", encode_cursor(3, value="12.00", field="price")),
+        ]:
+            with self.subTest(ordering=ordering, cursor=cursor):
+                self.assertEqual(self.client.get(url, {"ordering": ordering, "cursor": cursor}).status_code, 400)
+        self.assertEqual(self.client.get(url, {
+            "ordering": "price", "cursor": encode_cursor(3, value="12.00", field="price"),
+        }).status_code, 200)
+
+    def test_facets_come_from_one_grouped_query_and_ignore_their_own_filter(self):
+        query = catalog.parse({"in_stock": "yes", "min_price": "15"})
+        connection.queries_log.clear()
+        with self.assertNumQueries(1):
+            facets = catalog.get_facets(query)
+        self.assertEqual(facets["price"], [
+            {"min": "0", "max": "15", "count": 3},
+            {"min": "15", "max": "20", "count": 3},
+            {"min": "20", "max": None, "count": 2},
+        ])
+        self.assertEqual(facets["availability"], {"in_stock": 5, "out_of_stock": 3})
+        self.assertEqual(self.listing(in_stock="1", min_price="15", facets="1")["facets"], facets)
+        self.assertNotIn("facets", self.listing())
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({"ordering": "stock"}, {"min_price": "cheap"}, {"min_price": "5", "max_price": "1"},
+                       {"max_price": "NaN"}, {"in_stock": "maybe"}):
+            response = self.client.get(reverse("api_product_list"), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("error", response.json())
+        self.assertEqual(self.drf_listing(ordering="random").status_code, 400)
+
+    def test_pages_are_cached_per_normalized_query(self):
+        products = Product.objects.values("id", "name")
+        first = catalog.parse({"min_price": "15", "in_stock": "true"})
+        same = catalog.parse({"in_stock": "1", "min_price": "15.00"})
+        self.assertEqual(first.normalized(), same.normalized())
+        page = catalog.get_page(products, first, None, 5)
+        connection.queries_log.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(catalog.get_page(products, same, None, 5).items, page.items)
+
+        Product.objects.filter(pk=5).update(stock=0)
+        Product.objects.get(pk=7).save()  # bumps the catalog version
+        self.assertEqual([row["id"] for row in catalog.get_page(products, same, None, 5).items], [7, 8, 10, 11])
+
+        response = self.drf_listing(min_price="15", in_stock="1", fields="id")
+        self.assertEqual([row["id"] for row in response.data["results"]], [7, 8, 10, 11])
+
+
+# -------------------------
+# Cached API authentication
+# -------------------------
+class AuthCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_products(3)
+        cls.user = get_user_model().objects.create_user("carol", "carol@example.com", "pass12345")
+
+    def setUp(self):
+        cache.clear()
+        auth_cache.reset()
+        self.view = ProductRetrieveUpdateDeleteView.as_view()
+
+    def obtain(self):
+        response = self.client.post(reverse("token_obtain_pair"), {"username": "carol", "password": "pass12345"})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def get_product(self, authorization):
+        request = APIRequestFactory().get("/api/products/1/", HTTP_AUTHORIZATION=authorization)
+        return self.view(request, pk=1)
+
+    def test_jwt_requests_skip_the_user_query_once_cached(self):
+        access = self.obtain()["access"]
+        self.assertEqual(self.get_product(f"Bearer {access}").status_code, 200)
+        connection.queries_log.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_product(f"Bearer {access}").status_code, 200)
+        self.assertEqual(auth_cache.stats()["misses"], 1)
+
+    def test_password_change_and_logout_revoke_issued_tokens(self):
+        tokens = self.obtain()
+        self.user.set_password("new-pass12345")
+        self.user.save()
+        response = self.get_product(f"Bearer {tokens['access']}")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data["detail"].code, "token_revoked")
+        refreshed = self.client.post(reverse("token_refresh"), {"refresh": tokens["refresh"]})
+        self.assertEqual(refreshed.status_code, 401)
+
+        self.client.login(username="carol", password="new-pass12345")
+        access = self.client.post(reverse("token_obtain_pair"), {"username": "carol", "password": "new-pass12345"}).json()["access"]
+        self.assertEqual(self.get_product(f"Bearer {access}").status_code, 200)
+        self.client.get(reverse("logout"))
+        self.assertEqual(self.get_product(f"Bearer {access}").status_code, 401)
+
+    def test_deactivation_is_seen_despite_a_cached_snapshot(self):
+        access = self.obtain()["access"]
+        self.assertEqual(self.get_product(f"Bearer {access}").status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_product(f"Bearer {access}").status_code, 401)
+
+    def test_drf_token_is_cached_until_deleted(self):
+        from rest_framework.authtoken.models import Token
+
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.assertEqual(self.get_product(f"Token {token.key}").status_code, 200)
+        connection.queries_log.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_product(f"Token {token.key}").status_code, 200)
+        token.delete()
+        self.assertEqual(self.get_product(f"Token {token.key}").status_code, 401)
+
+    def test_snapshots_are_copies_without_the_password(self):
+        first, second = auth_cache.get_user(self.user.pk), auth_cache.get_user(self.user.pk)
+        self.assertIsNot(first, second)
+        self.assertNotIn("password", first.__dict__)
+        get_user_model().objects.filter(pk=self.user.pk).update(first_name="Caz")
+        self.user.save(update_fields=["email"])
+        self.assertEqual(auth_cache.get_user(self.user.pk).first_name, "Caz")
+
+
+# -------------------------
+# Storefront page and fragment caching
+# -------------------------
+class StorefrontCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_products(3)
+        cls.user = get_user_model().objects.create_user("dana", "dana@example.com", "pass12345")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_product_page_is_served_from_the_cache_until_the_product_changes(self):
+        url = reverse("product_page", args=[2])
+        first = self.client.get(url)
+        self.assertNotContains(first, '<meta name="csrf-token"')
+        self.assertIn("Cookie", first["Vary"])
+        connection.queries_log.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, first.content)
+
+        product = Product.objects.get(pk=2)
+        product.name = "Renamed"
+        product.save()
+        self.assertContains(self.client.get(url), "Renamed")
+
+    def test_logged_in_pages_are_not_shared(self):
+        url = reverse("product_page", args=[2])
+        self.client.get(url)
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertContains(response, '<meta name="csrf-token"')
+        self.assertContains(response, "Logout")
+
+    def test_product_cards_are_cached_per_product_version(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse("product_list")), "Product 1")
+        # A queryset update skips auto_now, so the cached card is still current as far as its key knows.
+        Product.objects.filter(pk=1).update(name="Stale")
+        self.assertNotContains(self.client.get(reverse("product_list")), "Stale")
+        Product.objects.get(pk=1).save()
+        self.assertContains(self.client.get(reverse("product_list")), "Stale")
+        self.assertContains(self.client.get(reverse("home")), "Stale")
+
+
+# -------------------------
+# Cart stores, guest carts and write-behind persistence
+# -------------------------
+class CartStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("erin", "erin@example.com", "pass12345")
+        cls.lamp = Product.objects.create(id=1, name="Lamp", price=Decimal("20.00"), stock=3)
+        cls.mug = Product.objects.create(id=2, name="Mug", price=Decimal("4.50"), stock=5)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_guest_cart_is_merged_on_login_up_to_stock(self):
+        cart_service.add_item(self.user, self.lamp, 2)
+        for product in (self.lamp, self.lamp, self.mug):
+            self.client.get(reverse("add_to_cart", args=[product.id]))
+        self.assertContains(self.client.get(reverse("cart_view")), "Mug")
+        self.assertEqual(CartItem.objects.count(), 1)  # only the user's own line
+
+        self.client.post(reverse("login"), {"username": "erin", "password": "pass12345"})
+        lines = dict(CartItem.objects.filter(cart__user=self.user).values_list("product_id", "quantity"))
+        self.assertEqual(lines, {1: 3, 2: 1})
+        self.assertNotIn(cart_service.SESSION_KEY, self.client.session)
+
+    @override_settings(CART_STORE="cache")
+    def test_cache_store_writes_skip_the_database_until_persisted(self):
+        cart_service.add_item(self.user, self.lamp)
+        product_cache.get_product(self.mug.pk)  # the add_to_cart view reads products through this cache
+        connection.queries_log.clear()
+        with self.assertNumQueries(0):
+            cart_service.add_item(self.user, self.mug, 2)
+            cart_service.update_item(self.user, self.lamp.id, 2)
+            self.assertEqual(cart_service.get_summary(self.user)["count"], 4)
+        with self.assertRaises(cart_service.OutOfStock):
+            cart_service.add_item(self.user, self.lamp, 2)
+        self.assertFalse(CartItem.objects.exists())
+
+        self.assertEqual(cart_store.persist_dirty(), 1)
+        self.assertEqual(sorted(CartItem.objects.values_list("product_id", "quantity")), [(1, 2), (2, 2)])
+        cart_service.remove_item(self.user, self.mug.id)
+        call_command("persist_carts", stdout=StringIO())
+        self.assertEqual(list(CartItem.objects.values_list("product_id", "quantity")), [(1, 2)])
+
+        # An evicted cart comes back from its persisted copy.
+        cache.delete(f"cart:{self.user.pk}")
+        self.assertEqual(cart_service.get_lines(self.user), [(1, 2)])
+
+    @override_settings(CART_STORE="cache")
+    def test_dirty_carts_are_logged_per_user_without_a_shared_lock(self):
+        other = get_user_model().objects.create_user("fay", "fay@example.com", "pass12345")
+        cache.add("cart-dirty:lock", "held", 60)  # the old global lock no longer matters
+        cart_service.add_item(self.user, self.lamp)
+        cart_service.add_item(self.user, self.mug)  # already flagged: not logged twice
+        cart_service.add_item(other, self.mug, 2)
+        self.assertEqual(cache.get(cart_store.LOG_SEQ_KEY), 2)
+        self.assertEqual(cart_store.persist_dirty(), 2)
+        self.assertEqual(cart_store.persist_dirty(), 0)
+
+        # A numbered entry not stored yet waits one run, then is skipped.
+        cache.incr(cart_store.LOG_SEQ_KEY)
+        cart_service.update_item(other, self.mug.id, 1)
+        self.assertEqual(cart_store.persist_dirty(), 0)
+        self.assertEqual(cart_store.persist_dirty(), 1)
+        self.assertEqual(CartItem.objects.get(cart__user=other).quantity, 1)
+
+    def test_persist_is_repeatable_with_and_without_conflict_targets(self):
+        for supported in (True, False):
+            with self.subTest(update_conflicts_with_target=supported), mock.patch.object(
+                connection.features, "supports_update_conflicts_with_target", supported,
+            ):
+                cart_store.persist(self.user.pk, {1: 1, 2: 2})
+                cart_store.persist(self.user.pk, {2: 3})
+                self.assertEqual(list(CartItem.objects.values_list("product_id", "quantity")), [(2, 3)])
+                CartItem.objects.all().delete()
+
+    @override_settings(CART_STORE="cache")
+    def test_a_held_cart_lock_is_neither_bypassed_nor_released_by_others(self):
+        key = f"cart:{self.user.pk}"
+        cache.add(f"{key}:lock", "other-writer", 60)
+        with mock.patch.object(cart_store, "LOCK_WAIT", 0.01), self.assertRaises(cart_service.CartBusy):
+            cart_service.add_item(self.user, self.lamp)
+        self.assertEqual(cache.get(f"{key}:lock"), "other-writer")
+        self.assertEqual(cart_service.get_lines(self.user), [])
+
+        # A writer that overran its lock leaves the next holder's lock alone.
+        cache.delete(f"{key}:lock")
+        with cart_store._locked(key):
+            cache.set(f"{key}:lock", "next-writer", 60)
+        self.assertEqual(cache.get(f"{key}:lock"), "next-writer")
+
+    @override_settings(CART_STORE="cache")
+    def test_checkout_reads_and_empties_the_cache_store(self):
+        cart_service.add_item(self.user, self.mug, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = checkout_service.checkout(self.user)
+        self.assertEqual(order.total, Decimal("9.00"))
+        self.assertEqual(cart_service.get_lines(self.user), [])
+        self.assertEqual(cart_service.get_summary(self.user)["count"], 0)
+        self.assertEqual(Product.objects.get(pk=2).stock, 3)
+
+
+# -------------------------
+# Batched product reads
+# -------------------------
+@override_settings(PRODUCT_BATCH_MAX_IDS=5)
+class ProductBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_products(6)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_get_returns_requested_order_with_misses_from_one_query(self):
+        url = reverse("api_product_list") + "?ids=3,99,1,3&fields=id,name"
+        connection.queries_log.clear()
+        with self.assertNumQueries(1):
+            payload = self.client.get(url).json()
+        self.assertEqual(payload, {
+            "results": [{"id": 3, "name": "Product 3"}, None, {"id": 1, "name": "Product 1"}],
+            "missing": [99],
+        })
+        # Hits need no query at all; only ids that do not exist are looked up again.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse("api_product_list") + "?ids=3,1").json()["missing"], [])
+
+    def test_post_accepts_json_and_partially_cached_lists(self):
+        product_cache.get_product(2)
+        connection.queries_log.clear()
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse("api_product_list"), {"ids": [2, 5]}, content_type="application/json")
+        self.assertEqual([row["id"] for row in response.json()["results"]], [2, 5])
+        self.assertEqual(product_cache.get_many([5]).keys(), {5})
+
+    def test_invalid_ids_are_rejected(self):
+        for ids in ("", "1,x", "1,2,3,4,5,6"):
+            self.assertEqual(self.client.get(reverse("api_product_list"), {"ids": ids}).status_code, 400, ids)
+        response = self.client.post(reverse("api_product_list"), {"ids": "nope"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_async_and_drf_views_agree(self):
+        from website.views import api_product_list_async
+
+        response = async_to_sync(api_product_list_async)(AsyncRequestFactory().get("/api/products/?ids=4,2,7"))
+        self.assertEqual(json.loads(response.content)["missing"], [7])
+        request = APIRequestFactory().get("/api/products/?ids=4,2,7&fields=id,price")
+        force_authenticate(request, get_user_model().objects.create_user("frank", "frank@example.com", "pass12345"))
+        drf = ProductListCreateView.as_view()(request)
+        self.assertEqual(drf.data["results"], [{"id": 4, "price": "14.00"}, {"id": 2, "price": "12.00"}, None])
@@ -1,5 +1,12 @@
+from django.conf import settings
 from django.urls import path
 from website import views
+from website.api.views import ProductBulkView
+
+if settings.ASYNC_VIEWS:
+    api_product_list_view, cart_view = views.api_product_list_async, views.cart_view_async
+else:
+    api_product_list_view, cart_view = views.api_product_list, views.cart_view
 
 urlpatterns = [
     # ----------------- Public Pages -----------------
@@ -21,14 +28,21 @@ urlpatterns = [
     path('users/add/', views.add_user, name='add_user'),
 
     # ----------------- Cart -----------------
-    path('cart/', views.cart_view, name='cart_view'),
+    path('cart/', cart_view, name='cart_view'),
     path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
     path('cart/remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('cart/update/<int:item_id>/', views.update_cart, name='update_cart'),
+    path('cart/checkout/', views.checkout, name='checkout'),
 
     # ----------------- API -----------------
     path('api/login/', views.SimpleLoginView.as_view(), name='api_login'),
-    path('api/products/<int:id>', views.api_product_list, name='api_product_list'),
-    path('api/products/', views.api_product_list, name='api_product_list'),
+    path('api/products/bulk/', ProductBulkView.as_view(), name='api_product_bulk'),
+    path('api/products/search/', views.api_product_search, name='api_product_search'),
+    path('api/products/export/', views.api_product_export, name='api_product_export'),
+    path('api/products/<int:id>', api_product_list_view, name='api_product_list'),
+    path('api/products/', api_product_list_view, name='api_product_list'),
     path('api/product/',views.api_product, name='api_admin_prodcut'),
+
+    # ----------------- Monitoring -----------------
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -1,11 +1,13 @@
 
+import hmac
 import json
 from django.forms import model_to_dict
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout, get_user_model
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
 # REST Framework imports
@@ -16,6 +18,21 @@ from rest_framework import status, authentication, permissions
 # Models and Forms
 from website.models import Product, ProductImage, Cart, CartItem
 from website.forms import ProductForm, CustomUserCreationForm
+from website.services import cart as cart_service
+from website.services import catalog
+from website.services import checkout as checkout_service
+from website.services import dashboard as dashboard_service
+from website.services import export
+from website.services import search as product_search
+from website.services import product_cache
+from website import metrics as request_metrics
+from website.conditional import async_product_conditional, product_conditional
+from website.page_cache import anonymous_page_cache
+from website.pagination import (
+    InvalidCursor, InvalidFields, get_fields, get_page_size, page_links, paginate,
+)
+
+PRODUCT_API_FIELDS = ('id', 'name', 'price', 'description', 'stock')
 
 # -------------------------
 # CSRF-exempt authentication for API
@@ -46,12 +63,27 @@ class SimpleLoginView(APIView):
 # -------------------------
 # Public Views
 # -------------------------
+def _product_page(request, queryset):
+    # HTML listings restart from the first page on a stale or mangled cursor.
+    try:
+        return paginate(queryset, request.GET.get('cursor'), get_page_size(request))
+    except InvalidCursor:
+        return paginate(queryset, None, get_page_size(request))
+
+@anonymous_page_cache
 def home(request):
-    products = Product.objects.all()
-    return render(request, "website/home.html", {"products": products})
+    page = _product_page(request, Product.objects.with_primary_image())
+    return render(request, "website/Home.html", {"products": page.items, "page": page})
+
+def _cached_product_or_404(pk):
+    try:
+        return product_cache.get_product(pk)
+    except Product.DoesNotExist:
+        raise Http404("No Product matches the given query.")
 
+@anonymous_page_cache
 def product_page(request, id):
-    product = get_object_or_404(Product, id=id)
+    product = _cached_product_or_404(id)
     return render(request, 'website/products/product_page.html', {'product': product})
 
 def login_view(request):
@@ -88,13 +120,68 @@ def signup(request):
         form = CustomUserCreationForm()
     return render(request, 'website/signup.html', {'form': form})
 
+@product_conditional
 def api_product_list(request, id=None):
-    if id is not None:
-        product = get_object_or_404(Product, pk=id)
-        data = model_to_dict(product, fields=['id', 'name', 'price', 'description', 'stock'])
-        return JsonResponse(data)
-    products = Product.objects.all().values('id', 'name', 'price', 'description', 'stock')
-    return JsonResponse(list(products), safe=False)
+    try:
+        fields = get_fields(request, PRODUCT_API_FIELDS)
+        if id is not None:
+            product = _cached_product_or_404(id)
+            return JsonResponse(model_to_dict(product, fields=fields))
+        ids = catalog.batch_ids(request)
+        if ids is not None:
+            products = product_cache.get_many(ids)
+            return JsonResponse(catalog.batch_payload(ids, products, lambda p: model_to_dict(p, fields=fields)))
+        query = catalog.parse(request.GET)
+        products = Product.objects.values(*dict.fromkeys(fields + ['id', query.sort_field]))
+        page = catalog.get_page(
+            products, query, request.GET.get('cursor'), get_page_size(request), variant=','.join(fields),
+        )
+        facets = catalog.get_facets(query) if catalog.wants_facets(request.GET) else None
+    except (InvalidCursor, InvalidFields, catalog.InvalidQuery) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    results = [{field: row[field] for field in fields} for row in page.items]
+    payload = {**page_links(request, page), 'results': results}
+    if facets is not None:
+        payload['facets'] = facets
+    return JsonResponse(payload)
+
+def api_product_search(request):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'q is required'}, status=400)
+    ids, source = product_search.search(query, limit=get_page_size(request))
+    products = Product.objects.in_bulk(ids)
+    results = [
+        model_to_dict(products[pk], fields=PRODUCT_API_FIELDS) for pk in ids if pk in products
+    ]
+    return JsonResponse({'query': query, 'source': source, 'results': results})
+
+def api_product_export(request):
+    export_format = request.GET.get('format', 'json')
+    if export_format not in export.FORMATS:
+        return JsonResponse({'error': f"format must be one of {', '.join(export.FORMATS)}"}, status=400)
+    chunks = export.iter_export(export_format)
+    content_type = 'application/x-ndjson' if export_format == 'ndjson' else 'application/json'
+    if not export.accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+    else:
+        response = StreamingHttpResponse(export.gzip_chunks(chunks), content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    response['Content-Disposition'] = f'attachment; filename="products.{export_format}"'
+    return response
+
+def _metrics_token_ok(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    return bool(token) and hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', '').encode(), f'Bearer {token}'.encode(),
+    )
+
+def metrics(request):
+    allowed = request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    if not (allowed or _metrics_token_ok(request) or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(request_metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 def api_product(request):
     if request.method == 'POST':
@@ -139,8 +226,8 @@ def api_product(request):
 # -------------------------
 @login_required
 def product_list(request): 
-    products = Product.objects.all().order_by('id')
-    return render(request, 'website/products/product_list.html', {'products': products})
+    page = _product_page(request, Product.objects.with_primary_image())
+    return render(request, 'website/products/product_list.html', {'products': page.items, 'page': page})
 
 @login_required
 def add_product(request):
@@ -201,11 +288,12 @@ def add_user(request):
 # -------------------------
 @login_required
 def dashboard(request):
-    products = Product.objects.all()
-    users = CustomUser.objects.all()  # Use AuthUser here
-    return render(request, "website/dashboard.html", {
-        "products": products,
-        "users": users,
+    return render(request, "website/Dashboard.html", {
+        "stats": dashboard_service.get_stats(),
+        "recent_products": dashboard_service.recent_products(),
+        "low_stock_products": dashboard_service.low_stock_products(),
+        "recent_users": dashboard_service.recent_users(),
+        "low_stock_threshold": dashboard_service.low_stock_threshold(),
     })
 
 # -------------------------
@@ -214,50 +302,101 @@ def dashboard(request):
 from website.models import Product, Cart, CartItem
 
 # Add to Cart
-@login_required
 def add_to_cart(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    if product.stock <= 0:
-        messages.error(request, f"{product.name} is out of stock!")
-        return redirect('product_list')
-
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
-    if not created:
-        cart_item.quantity += 1
-        cart_item.save()
+    # Anonymous shoppers get a guest cart, merged into theirs when they log in.
+    product = _cached_product_or_404(product_id)
+    back = 'product_list' if request.user.is_authenticated else 'cart_view'
+    try:
+        cart_service.add_item(cart_service.cart_owner(request, create=True), product)
+    except (cart_service.OutOfStock, cart_service.CartBusy) as exc:
+        messages.error(request, str(exc))
+        return redirect(back)
 
     messages.success(request, f"{product.name} added to cart!")
-    return redirect('product_list')
+    return redirect(back)
 
-#logout
-@login_required
 def cart_view(request):
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    items = cart.items.all()
-    return render(request, 'website/cart.html', {'cart': cart, 'items': items})
+    items = cart_service.get_items(cart_service.cart_owner(request))
+    return render(request, 'website/cart.html', {'items': items})
 
 
 # Remove from Cart
-@login_required
 def remove_from_cart(request, item_id):
-    print(item_id)
-    item = get_object_or_404(CartItem, product_id=item_id, cart__user=request.user)
-    item.delete()
+    owner = cart_service.cart_owner(request)
+    try:
+        if owner is None or not cart_service.remove_item(owner, item_id):
+            raise Http404("No such cart item.")
+    except cart_service.CartBusy as exc:
+        messages.error(request, str(exc))
     return redirect('cart_view')
 
 # Update Quantity
-@login_required
 def update_cart(request, item_id):
     if request.method == "POST":
-        item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
+        owner = cart_service.cart_owner(request)
         quantity = int(request.POST.get("quantity", 1))
-        if quantity > 0:
-            item.quantity = quantity
-            item.save()
+        try:
+            if owner is None:
+                raise CartItem.DoesNotExist
+            cart_service.update_item(owner, item_id, quantity)
+        except CartItem.DoesNotExist:
+            raise Http404("No such cart item.")
+        except (cart_service.OutOfStock, cart_service.CartBusy) as exc:
+            messages.error(request, str(exc))
+    return redirect('cart_view')
+
+# Checkout
+@login_required
+def checkout(request):
+    if request.method == "POST":
+        try:
+            order = checkout_service.checkout(request.user)
+        except checkout_service.CheckoutError as exc:
+            messages.error(request, str(exc))
         else:
-            item.delete()
+            messages.success(request, f"Order #{order.pk} placed. Your items are reserved for "
+                                      f"{int(checkout_service.reservation_timeout().total_seconds() // 60)} minutes.")
     return redirect('cart_view')
+
+# -------------------------
+# Async views (routed when ASYNC_VIEWS is on, see ecommerceb/asgi.py)
+# -------------------------
+@async_product_conditional
+async def api_product_list_async(request, id=None):
+    try:
+        fields = get_fields(request, PRODUCT_API_FIELDS)
+        if id is not None:
+            try:
+                product = await product_cache.aget_product(id)
+            except Product.DoesNotExist:
+                raise Http404("No Product matches the given query.")
+            return JsonResponse(model_to_dict(product, fields=fields))
+        ids = catalog.batch_ids(request)
+        if ids is not None:
+            products = await product_cache.aget_many(ids)
+            return JsonResponse(catalog.batch_payload(ids, products, lambda p: model_to_dict(p, fields=fields)))
+        query = catalog.parse(request.GET)
+        products = Product.objects.values(*dict.fromkeys(fields + ['id', query.sort_field]))
+        page = await catalog.aget_page(
+            products, query, request.GET.get('cursor'), get_page_size(request), variant=','.join(fields),
+        )
+        facets = await catalog.aget_facets(query) if catalog.wants_facets(request.GET) else None
+    except (InvalidCursor, InvalidFields, catalog.InvalidQuery) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    results = [{field: row[field] for field in fields} for row in page.items]
+    payload = {**page_links(request, page), 'results': results}
+    if facets is not None:
+        payload['facets'] = facets
+    return JsonResponse(payload)
+
+async def cart_view_async(request):
+    # Resolve the owner and navbar summary here so rendering never touches the sync ORM.
+    request.user = await request.auser()
+    owner = await cart_service.acart_owner(request)
+    if owner is not None:
+        request._cart_summary = await cart_service.aget_summary(owner)
+    items = await cart_service.aget_items(owner)
+    return render(request, 'website/cart.html', {'items': items})
 from website.models import Cart
 
 def ensure_cart(user):